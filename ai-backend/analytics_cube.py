@@ -0,0 +1,152 @@
+"""
+Precomputed analytics cube over the knowledge base.
+Dimensions: state x disaster type x subtype x year bucket; measures: event
+count, deaths and damage. Every roll-up (any dimension set to "all") is
+computed once when the knowledge base loads, so a slice or a breakdown is a
+dictionary lookup instead of a scan over the records.
+"""
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ("state", "type", "subtype", "year_bucket")
+YEAR_BUCKET = int(os.getenv("STATS_YEAR_BUCKET", 10))
+UNKNOWN = "Unknown"
+
+# Knowledge-base column feeding each dimension / measure
+SOURCE_COLUMNS = {
+    "type": "Disaster Type",
+    "subtype": "Disaster Subtype",
+    "year": "Start Year",
+    "deaths": "Total Deaths",
+    "damage": "Total Damage ('000 US$)",
+}
+
+EMPTY = {"count": 0, "deaths": 0, "damage": 0.0}
+
+
+def _column(df, name, default):
+    col = SOURCE_COLUMNS[name]
+    if col in df.columns:
+        return df[col].to_numpy()
+    return np.full(len(df), default, dtype=object)
+
+
+def _facts(df, year_bucket):
+    """One row per record with the cube's dimension values and measures."""
+    years = pd.to_numeric(pd.Series(_column(df, "year", np.nan)), errors="coerce")
+    buckets = (years // year_bucket * year_bucket).astype("Int64").astype(object)
+    facts = pd.DataFrame({
+        "type": pd.Series(_column(df, "type", UNKNOWN), dtype=object),
+        "subtype": pd.Series(_column(df, "subtype", UNKNOWN), dtype=object),
+        "year_bucket": buckets,
+        "deaths": pd.to_numeric(pd.Series(_column(df, "deaths", np.nan)), errors="coerce"),
+        "damage": pd.to_numeric(pd.Series(_column(df, "damage", np.nan)), errors="coerce"),
+    })
+    for dim in ("type", "subtype", "year_bucket"):
+        facts[dim] = facts[dim].where(facts[dim].notna(), UNKNOWN)
+    return facts
+
+
+class StatsCube:
+    """All roll-ups of the state x type x subtype x year-bucket cube.
+
+    Cells are keyed by a 4-tuple in DIMENSIONS order, with None meaning
+    "all values". `children[dim][key]` lists the cells one level below
+    `key` along `dim`, which answers breakdowns without scanning.
+    """
+
+    def __init__(self, cells, year_bucket=YEAR_BUCKET):
+        self.cells = cells
+        self.year_bucket = year_bucket
+        self.children = {dim: {} for dim in DIMENSIONS}
+        for key in cells:
+            for i, dim in enumerate(DIMENSIONS):
+                if key[i] is not None:
+                    parent = key[:i] + (None,) + key[i + 1:]
+                    self.children[dim].setdefault(parent, []).append(key)
+        # Time series read best in order; everything else by frequency
+        for dim, index in self.children.items():
+            i = DIMENSIONS.index(dim)
+            for keys in index.values():
+                if dim == "year_bucket":
+                    keys.sort(key=lambda k: (k[i] == UNKNOWN, 0 if k[i] == UNKNOWN else k[i]))
+                else:
+                    keys.sort(key=lambda k: -cells[k]["count"])
+
+    @classmethod
+    def build(cls, df, partitions, year_bucket=YEAR_BUCKET):
+        """Aggregate `df` once for every combination of dimensions.
+
+        Args:
+            df: knowledge-base records
+            partitions: state name -> row positions (the knowledge base index;
+                an event naming several states counts once under each)
+        """
+        if df is None or df.empty:
+            return cls({}, year_bucket)
+        facts = _facts(df, year_bucket)
+        names = list(partitions)
+        rows = np.concatenate([partitions[n] for n in names]) if names else np.empty(0, dtype=np.int64)
+        by_state = facts.iloc[rows].reset_index(drop=True)
+        by_state.insert(0, "state", np.repeat(np.asarray(names, dtype=object),
+                                              [len(partitions[n]) for n in names]))
+
+        cells = {}
+        others = DIMENSIONS[1:]
+        for r in range(len(others) + 1):
+            for subset in combinations(others, r):
+                # State-level cells from the per-state rows, totals from the records
+                for frame, dims in ((by_state, ("state",) + subset), (facts, subset)):
+                    cls._aggregate(frame, dims, cells)
+        return cls(cells, year_bucket)
+
+    @staticmethod
+    def _aggregate(frame, dims, cells):
+        if dims:
+            grouped = frame.groupby(list(dims), sort=False, dropna=False).agg(
+                count=("deaths", "size"), deaths=("deaths", "sum"), damage=("damage", "sum"))
+            groups = grouped.itertuples(name=None)
+        else:
+            groups = [((), len(frame), frame["deaths"].sum(), frame["damage"].sum())]
+        for values, count, deaths, damage in groups:
+            values = values if isinstance(values, tuple) else (values,)
+            fixed = dict(zip(dims, values))
+            key = tuple(fixed.get(dim) for dim in DIMENSIONS)
+            cells[key] = {"count": int(count), "deaths": int(round(deaths)), "damage": round(float(damage), 1)}
+
+    def bucket(self, year):
+        """Year bucket containing `year`."""
+        return int(year) // self.year_bucket * self.year_bucket
+
+    def key(self, state=None, type=None, subtype=None, year_bucket=None):
+        return (state, type, subtype, year_bucket)
+
+    def cell(self, **filters):
+        """Measures for one slice; unspecified dimensions are rolled up."""
+        return dict(self.cells.get(self.key(**filters), EMPTY))
+
+    def breakdown(self, group_by, **filters):
+        """Measures for each value of `group_by` within the slice."""
+        if group_by not in DIMENSIONS:
+            raise ValueError(f"group_by must be one of {', '.join(DIMENSIONS)}")
+        i = DIMENSIONS.index(group_by)
+        parent = self.key(**filters)
+        parent = parent[:i] + (None,) + parent[i + 1:]
+        return [dict(self.cells[k], value=k[i]) for k in self.children[group_by].get(parent, [])]
+
+    def values(self, dim):
+        """Distinct values of a dimension."""
+        return [k[DIMENSIONS.index(dim)] for k in self.children[dim].get((None,) * len(DIMENSIONS), [])]
+
+    def resolve(self, dim, name):
+        """Cube value of `dim` matching `name` like resolve_type ("floods" -> "Flood"), or None."""
+        key = name.strip().casefold()
+        values = {str(v).casefold(): v for v in self.values(dim)}
+        if key in values:
+            return values[key]
+        if key.endswith("s") and key[:-1] in values:
+            return values[key[:-1]]
+        return None
@@ -1,37 +1,31 @@
-from flask import Flask, request, jsonify
-import pickle
-import pandas as pd
+import json
 import os
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-from weather import get_weather, get_weather_history
-from prediction import predict_disaster_risk
+from werkzeug.exceptions import BadRequest
+from weather import get_weather, get_weather_many, get_weather_history, weather_cache_stats
+from prediction import predict_disaster_risk, predict_disaster_risk_batch
+from knowledge_base import get_knowledge_base
+from weather_prefetch import start_prefetcher, prefetch_stats
+from model_registry import registry
 
 app = Flask(__name__)
 CORS(app)
 
+MAX_BATCH_ITEMS = 500
+MAX_NEARBY_RESULTS = 1000
+MAX_SEARCH_PAGE = 100
+
 # Load AI knowledge for historical data only
-try:
-    df = pickle.load(open("models/disaster_knowledge_clean.pkl", "rb"))
-    print(f"[OK] Loaded {len(df)} disaster records")
-except Exception as e:
-    print(f"[WARNING] Could not load clean data: {e}")
-    try:
-        df = pickle.load(open("models/disaster_knowledge.pkl", "rb"))
-        print(f"[OK] Loaded original data: {len(df)} records")
-    except:
-        df = pd.DataFrame()
-
-try:
-    le_location = pickle.load(open("models/state_encoder.pkl", "rb"))
-    print(f"[OK] Loaded state encoder with {len(le_location.classes_)} states")
-    print(f"[INFO] Available states: {list(le_location.classes_)[:10]}...")
-except Exception as e:
-    print(f"[WARNING] Could not load state encoder: {e}")
-    try:
-        le_location = pickle.load(open("models/location_encoder.pkl", "rb"))
-        print(f"[OK] Loaded location encoder")
-    except:
-        le_location = None
+get_knowledge_base()
+
+# Hot-swap models / knowledge base when files in models/ change
+if os.getenv("MODEL_WATCH", "1") == "1":
+    registry.start_watcher()
+
+# Optional: keep hot locations' weather warm in the background
+if os.getenv("WEATHER_PREFETCH", "0") == "1":
+    start_prefetcher()
 
 
 @app.route("/", methods=["GET"])
@@ -42,14 +36,113 @@ def home():
         "message": "Disaster Preparedness API",
         "endpoints": [
             "/disaster-prediction?location=Mumbai",
+            "/disaster-prediction/batch",
             "/weather?location=Mumbai",
+            "/weather/cache-stats",
             "/weather-history?location=Mumbai&days=3",
+            "/locations/suggest?q=Tam",
+            "/stats?state=Kerala&group_by=type",
+            "/disasters/nearby?lat=23.0&lon=70.0&radius_km=200",
+            "/search?q=cyclone odisha",
             "/disaster",
-            "/modules"
+            "/modules",
+            "/admin/models"
         ]
     })
 
 
+def _stream_records(records, ndjson):
+    """Serialize a record generator as NDJSON lines or a JSON array."""
+    if ndjson:
+        for rec in records:
+            yield json.dumps(rec) + "\n"
+        return
+    yield "["
+    for i, rec in enumerate(records):
+        yield ("," if i else "") + json.dumps(rec)
+    yield "]"
+
+
+def _record_filters(kb, data):
+    """Parse `from_year`, `to_year` and `type` (comma separated) options.
+
+    Returns (filters, error_response); filters is None when none were given.
+    """
+    opts = {k: data.get(k, request.args.get(k)) for k in ("from_year", "to_year", "type")}
+    if all(v in (None, "") for v in opts.values()):
+        return None, None
+
+    filters = {}
+    try:
+        for key in ("from_year", "to_year"):
+            if opts[key] not in (None, ""):
+                filters[key] = int(opts[key])
+    except (TypeError, ValueError):
+        return None, (jsonify({"message": "from_year and to_year must be integers"}), 400)
+
+    types = opts["type"]
+    if isinstance(types, str):
+        types = [t for t in types.split(",") if t.strip()]
+    if types and (not isinstance(types, list) or not all(isinstance(t, str) for t in types)):
+        return None, (jsonify({"message": "type must be a string or a list of strings"}), 400)
+    if types:
+        resolved = [kb.resolve_type(t) for t in types]
+        unknown = [t for t, key in zip(types, resolved) if key is None]
+        if unknown:
+            return None, (jsonify({"message": f"Unknown disaster types: {', '.join(unknown)}",
+                                   "types": sorted(kb.type_names.values())}), 400)
+        filters["types"] = resolved
+    return filters, None
+
+
+def _paged_response(kb, rows, data, always=False):
+    """Build a paginated/projected/streamed response from request options.
+
+    Options (JSON body or query string): `limit`, `cursor` (row offset
+    returned by the previous page), `fields` (comma separated columns) and
+    `format` ("json" or "ndjson"). Returns None when no option was given,
+    unless `always` is set.
+    """
+    opts = {k: data.get(k, request.args.get(k)) for k in ("limit", "cursor", "fields", "format")}
+    if all(v is None for v in opts.values()) and not always:
+        return None
+
+    try:
+        start = int(opts["cursor"] or 0)
+        limit = int(opts["limit"]) if opts["limit"] is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "limit and cursor must be integers"}), 400
+    if start < 0 or (limit is not None and limit <= 0):
+        return jsonify({"message": "limit must be positive and cursor non-negative"}), 400
+
+    fields = opts["fields"]
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+    if fields and (not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)):
+        return jsonify({"message": "fields must be a string or a list of strings"}), 400
+    if fields:
+        unknown = [f for f in fields if f not in kb.columns()]
+        if unknown:
+            return jsonify({"message": f"Unknown fields: {', '.join(unknown)}",
+                            "fields": kb.columns()}), 400
+
+    if opts["format"] not in (None, "") and (not isinstance(opts["format"], str)
+                                          or opts["format"].lower() not in ("json", "ndjson")):
+        return jsonify({"message": "format must be 'json' or 'ndjson'"}), 400
+    ndjson = (opts["format"] or "").lower() == "ndjson"
+    total = len(rows)
+    end = total if limit is None else min(total, start + limit)
+
+    records = kb.iter_rows(rows, fields=fields, start=start, limit=limit)
+    resp = Response(_stream_records(records, ndjson),
+                    mimetype="application/x-ndjson" if ndjson else "application/json")
+    resp.headers["X-Total-Count"] = str(total)
+    if end < total:
+        resp.headers["X-Next-Cursor"] = str(end)
+    resp.headers["Access-Control-Expose-Headers"] = "X-Total-Count, X-Next-Cursor"
+    return resp
+
+
 @app.route("/get_location_data", methods=["POST"])
 def get_location_data():
     try:
@@ -61,55 +154,41 @@ def get_location_data():
         if not location:
             return jsonify({"message": "Location required"}), 400
 
-        if le_location is None or df.empty:
+        kb = get_knowledge_base()
+        if not kb.available:
             return jsonify({"message": "Historical data not available"}), 503
         
         print(f"Searching for location: '{location}'")
         
-        # Try exact match first (case-insensitive)
-        try:
-            encoded = le_location.transform([location])[0]
-            matched_location = location
-        except:
-            # Fuzzy match - find states containing the search term
-            matching_locations = [loc for loc in le_location.classes_ if location.lower() in loc.lower()]
-            
-            if not matching_locations:
-                available = ", ".join(list(le_location.classes_)[:5])
-                return jsonify({"message": f"No data for '{location}'. Try: {available}, etc."}), 404
-            
-            matched_location = matching_locations[0]
-            encoded = le_location.transform([matched_location])[0]
+        # Exact, alias, prefix and substring lookups via the resolver index
+        matched_location = kb.resolver.resolve(location)
+        if matched_location is None:
+            available = ", ".join(list(kb.encoder.classes_)[:5])
+            return jsonify({"message": f"No data for '{location}'. Try: {available}, etc."}), 404
         
         print(f"Matched '{location}' to '{matched_location}'")
+
+        # Year-range / type filters use the sorted per-state index and type bitmaps
+        filters, error = _record_filters(kb, data)
+        if error is not None:
+            return error
+        if filters is not None:
+            rows = kb.select(matched_location, **filters)
+            print(f"Returning {len(rows)} filtered records for '{matched_location}' ({filters})")
+            return _paged_response(kb, rows, data, always=True)
         
-        # Get data using State column if available, otherwise location_encoded
-        if 'State' in df.columns:
-            result = df[df['State'] == matched_location]
-        else:
-            result = df[df["location_encoded"] == encoded]
-        
-        if result.empty:
+        # Pre-serialized records from the per-state index
+        payload = kb.payload(matched_location)
+        if payload is None:
             return jsonify({"message": f"No historical disasters for '{location}'"}), 404
         
-        # Drop encoded column if exists
-        if 'location_encoded' in result.columns:
-            result = result.drop(columns=["location_encoded"])
-        
-        # Convert to records and clean NaN values
-        raw = result.to_dict(orient="records")
-        cleaned = []
-        for rec in raw:
-            cleaned_rec = {}
-            for k, v in rec.items():
-                if pd.isna(v):
-                    cleaned_rec[k] = None
-                else:
-                    cleaned_rec[k] = int(v) if isinstance(v, (int, float)) and k in ["Start Year", "Total Deaths"] else v
-            cleaned.append(cleaned_rec)
+        # Paginated / projected / NDJSON requests are streamed from a generator
+        paged = _paged_response(kb, kb.partitions[matched_location], data)
+        if paged is not None:
+            return paged
         
-        print(f"Returning {len(cleaned)} disaster records for '{matched_location}'")
-        return jsonify(cleaned)
+        print(f"Returning {len(kb.records(matched_location))} disaster records for '{matched_location}'")
+        return Response(payload, mimetype="application/json")
 
     except Exception as e:
         print(f"Error in get_location_data: {e}")
@@ -121,11 +200,140 @@ def get_location_data():
 @app.route("/locations", methods=["GET"])
 def get_locations():
     """List all available locations in the dataset"""
+    le_location = get_knowledge_base().encoder
     if le_location is None:
         return jsonify({"message": "No locations available"}), 503
     return jsonify({"locations": sorted(list(le_location.classes_))})
 
 
+@app.route("/locations/suggest", methods=["GET"])
+def suggest_locations():
+    """Autocomplete location names for ?q=..."""
+    q = request.args.get("q", "")
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    resolver = get_knowledge_base().resolver
+    if resolver is None:
+        return jsonify({"message": "No locations available"}), 503
+    return jsonify({"query": q, "suggestions": resolver.suggest(q, limit=limit)})
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Aggregates from the precomputed cube.
+
+    Filters: `state`, `type`, `subtype`, `year` (any year in the bucket) or
+    `year_bucket`; `group_by` (state, type, subtype, year_bucket) adds a
+    breakdown of the slice. Answered from lookups, no record scan.
+    """
+    kb = get_knowledge_base()
+    if not kb.available:
+        return jsonify({"message": "Historical data not available"}), 503
+    cube = kb.stats
+
+    filters = {}
+    state = request.args.get("state", "").strip()
+    if state:
+        filters["state"] = kb.resolver.resolve(state)
+        if filters["state"] is None:
+            return jsonify({"message": f"Unknown state '{state}'"}), 404
+    for dim in ("type", "subtype"):
+        if request.args.get(dim, "").strip():
+            filters[dim] = cube.resolve(dim, request.args[dim])
+            if filters[dim] is None:
+                return jsonify({"message": f"Unknown {dim} '{request.args[dim].strip()}'",
+                                dim + "s": sorted(map(str, cube.values(dim)))}), 400
+    try:
+        if request.args.get("year"):
+            filters["year_bucket"] = cube.bucket(request.args["year"])
+        elif request.args.get("year_bucket"):
+            filters["year_bucket"] = cube.bucket(request.args["year_bucket"])
+    except ValueError:
+        return jsonify({"message": "year must be an integer"}), 400
+
+    result = {"filters": filters, "year_bucket_size": cube.year_bucket, "totals": cube.cell(**filters)}
+    group_by = request.args.get("group_by")
+    if group_by:
+        try:
+            result["group_by"] = group_by
+            result["breakdown"] = cube.breakdown(group_by, **filters)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+    return jsonify(result)
+
+
+@app.route("/disasters/nearby", methods=["GET"])
+def disasters_nearby():
+    """Geolocated historical events near a point, nearest first.
+
+    ?lat=&lon= plus either `radius_km` (optionally `limit`) or `k` for the
+    k nearest events (default 10). Each record carries `distance_km`.
+    """
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius_km = request.args.get("radius_km", type=float)
+        k = request.args.get("k", 10, type=int)
+        limit = request.args.get("limit", MAX_NEARBY_RESULTS, type=int)
+    except (KeyError, ValueError):
+        return jsonify({"message": "lat and lon are required numbers"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"message": "lat must be within [-90, 90] and lon within [-180, 180]"}), 400
+    if (radius_km is not None and radius_km <= 0) or k <= 0 or limit <= 0:
+        return jsonify({"message": "radius_km, k and limit must be positive"}), 400
+
+    kb = get_knowledge_base()
+    if len(kb.geo) == 0:
+        return jsonify({"message": "No geolocated events loaded; rebuild the knowledge base with etl.py"}), 503
+
+    if radius_km is not None:
+        rows, dist = kb.geo.within(lat, lon, radius_km, limit=min(limit, MAX_NEARBY_RESULTS))
+    else:
+        rows, dist = kb.geo.nearest(lat, lon, k=min(k, MAX_NEARBY_RESULTS))
+    records = kb.records_at(rows)
+    for rec, d in zip(records, dist):
+        rec["distance_km"] = round(float(d), 2)
+    return jsonify({
+        "query": {"lat": lat, "lon": lon, "radius_km": radius_km, "k": None if radius_km is not None else k},
+        "indexed_events": len(kb.geo),
+        "count": len(records),
+        "results": records,
+    })
+
+
+@app.route("/search", methods=["GET"])
+def search():
+    """Full-text search over record text (event name, location, types).
+
+    ?q= query; `limit` (default 20) and `cursor` page through the ranked
+    hits; `prefix=0` disables prefix matching; `match=any` returns rows
+    matching any query word instead of all of them.
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"message": "q is required"}), 400
+    limit = min(request.args.get("limit", 20, type=int), MAX_SEARCH_PAGE)
+    cursor = request.args.get("cursor", 0, type=int)
+    if limit <= 0 or cursor < 0:
+        return jsonify({"message": "limit must be positive and cursor non-negative"}), 400
+
+    kb = get_knowledge_base()
+    if len(kb.search) == 0:
+        return jsonify({"message": "Historical data not available"}), 503
+    rows, scores, total = kb.search.search(q, prefix=request.args.get("prefix", "1") != "0",
+                                           match_all=request.args.get("match", "all") != "any",
+                                           offset=cursor, limit=limit)
+    records = kb.records_at(rows)
+    for rec, score in zip(records, scores):
+        rec["score"] = round(float(score), 4)
+    end = cursor + len(records)
+    return jsonify({
+        "query": q,
+        "total": total,
+        "next_cursor": end if end < total else None,
+        "results": records,
+    })
+
+
 # Frontend expects /disaster and /modules — provide simple endpoints
 @app.route("/disaster", methods=["GET"])
 def disaster():
@@ -149,6 +357,12 @@ def modules():
     return jsonify(modules_list)
 
 
+@app.route("/admin/models", methods=["GET"])
+def admin_models():
+    """Registered artifacts with version, checksum, load time and resident size."""
+    return jsonify({"artifacts": registry.info()})
+
+
 @app.route("/weather", methods=["GET"])
 def weather():
     # Accept ?location=... or JSON {"location": "..."}
@@ -162,9 +376,17 @@ def weather():
         return jsonify({"message": str(e)}), 502
 
 
+@app.route("/weather/cache-stats", methods=["GET"])
+def weather_cache():
+    """Weather cache hit/miss/coalesced counters."""
+    stats = weather_cache_stats()
+    stats["prefetch"] = prefetch_stats()
+    return jsonify(stats)
+
+
 @app.route("/weather-history", methods=["GET"])
 def weather_history():
-    """Fetch past N days of weather for a location."""
+    """Past N days of stored weather observations for a location."""
     loc = request.args.get("location") or (request.json or {}).get("location")
     days = request.args.get("days", 3, type=int)
     if not loc:
@@ -176,60 +398,145 @@ def weather_history():
         return jsonify({"message": str(e)}), 502
 
 
+def _prediction_input(data):
+    """(location, temp, humidity, wind) from query args or a JSON body."""
+    return data.get("location"), data.get("temp"), data.get("humidity"), data.get("wind")
+
+
+def _weather_inputs(weather_data):
+    """(temp, humidity, wind) from an OpenWeatherMap response, with defaults."""
+    return (weather_data.get("main", {}).get("temp", 25),
+            weather_data.get("main", {}).get("humidity", 50),
+            weather_data.get("wind", {}).get("speed", 5))
+
+
+def _predict_location(loc, temp, humidity, wind):
+    """Resolve `loc` to a known state and score it; the CPU-bound half of
+    /disaster-prediction (shared with the async server)."""
+    # Resolve location to a known state (city aliases included)
+    resolver = get_knowledge_base().resolver
+    matched_location = resolver.resolve(loc) if resolver is not None else None
+    location_encoded = resolver.encode(matched_location) if matched_location else None
+    
+    prediction = predict_disaster_risk(location_encoded, temp, humidity, wind)
+    
+    # Add weather data to response
+    prediction["weather_data"] = {
+        "temp": temp,
+        "humidity": humidity,
+        "wind": wind,
+        "location": loc
+    }
+    prediction["matched_location"] = matched_location
+    return prediction
+
+
 @app.route("/disaster-prediction", methods=["GET", "POST"])
 def disaster_prediction():
     """Predict disaster risk based on location and weather."""
     try:
         # Get location from query or JSON
-        if request.method == "POST":
-            data = request.json or {}
-            loc = data.get("location")
-            temp = data.get("temp")
-            humidity = data.get("humidity")
-            wind = data.get("wind")
-        else:
-            loc = request.args.get("location")
-            temp = request.args.get("temp")
-            humidity = request.args.get("humidity")
-            wind = request.args.get("wind")
+        data = (request.json or {}) if request.method == "POST" else request.args
+        loc, temp, humidity, wind = _prediction_input(data)
         
         if not loc:
             return jsonify({"message": "location required"}), 400
         
         # Fetch real-time weather if not provided
         if temp is None or humidity is None or wind is None:
-            weather_data = get_weather(loc)
-            temp = weather_data.get("main", {}).get("temp", 25)
-            humidity = weather_data.get("main", {}).get("humidity", 50)
-            wind = weather_data.get("wind", {}).get("speed", 5)
+            temp, humidity, wind = _weather_inputs(get_weather(loc))
         else:
             temp = float(temp)
             humidity = int(humidity)
             wind = float(wind)
         
-        # Use heuristic prediction
-        location_encoded = 0
-        if le_location is not None:
-            try:
-                location_encoded = le_location.transform([loc])[0]
-            except:
-                location_encoded = 0
-        
-        prediction = predict_disaster_risk(location_encoded, temp, humidity, wind)
-        
-        # Add weather data to response
-        prediction["weather_data"] = {
-            "temp": temp,
-            "humidity": humidity,
-            "wind": wind,
-            "location": loc
-        }
-        
-        return jsonify(prediction)
+        return jsonify(_predict_location(loc, temp, humidity, wind))
+    except BadRequest as e:  # malformed JSON body
+        return jsonify({"message": e.description}), 400
     except Exception as e:
         print(f"Error in disaster_prediction: {e}")
         return jsonify({"message": str(e)}), 500
 
 
+def _batch_rows(items):
+    """Split batch items into ready rows and locations needing weather.
+
+    Returns (results, rows, to_fetch): `results` holds errors by input
+    index, `rows` (index, location, temp, humidity, wind) tuples and
+    `to_fetch` (index, location) pairs.
+    """
+    results = [None] * len(items)
+    rows = []
+    to_fetch = []
+    for i, item in enumerate(items):
+        loc = item.get("location") if isinstance(item, dict) else None
+        if not loc:
+            results[i] = {"error": "location required"}
+            continue
+        if any(item.get(k) is None for k in ("temp", "humidity", "wind")):
+            to_fetch.append((i, loc))
+            continue
+        try:
+            rows.append((i, loc, float(item["temp"]), int(item["humidity"]), float(item["wind"])))
+        except (TypeError, ValueError):
+            results[i] = {"error": "temp, humidity and wind must be numeric"}
+    return results, rows, to_fetch
+
+
+def _predict_batch(results, rows, to_fetch, fetched):
+    """Fill `results` from ready rows plus fetched weather; returns results."""
+    for i, loc in to_fetch:
+        weather_data = fetched[loc]
+        if isinstance(weather_data, Exception):
+            results[i] = {"error": str(weather_data)}
+            continue
+        rows.append((i, loc) + _weather_inputs(weather_data))
+    
+    if rows:
+        resolver = get_knowledge_base().resolver
+        matched = [resolver.resolve(loc) if resolver is not None else None for _, loc, _, _, _ in rows]
+        encoded = [resolver.encode(m) if m else None for m in matched]
+        idx, locs, temps, hums, winds = zip(*rows)
+        predictions = predict_disaster_risk_batch(encoded, temps, hums, winds)
+        for i, loc, temp, humidity, wind, m, prediction in zip(idx, locs, temps, hums, winds, matched, predictions):
+            prediction["weather_data"] = {
+                "temp": temp,
+                "humidity": humidity,
+                "wind": wind,
+                "location": loc
+            }
+            prediction["matched_location"] = m
+            results[i] = prediction
+    return results
+
+
+def _batch_items(data):
+    """Validated item list of a batch body, or an error message."""
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, "items list required"
+    if len(items) > MAX_BATCH_ITEMS:
+        return None, f"At most {MAX_BATCH_ITEMS} items per batch"
+    return items, None
+
+
+@app.route("/disaster-prediction/batch", methods=["POST"])
+def disaster_prediction_batch():
+    """Predict disaster risk for many locations in one request.
+    
+    Body: {"items": [{"location", "temp", "humidity", "wind"}, ...]} (or the
+    bare list). Missing weather is fetched concurrently; results come back
+    in input order, with {"error": ...} for items that failed.
+    """
+    items, error = _batch_items(request.json)
+    if error:
+        return jsonify({"message": error}), 400
+    
+    results, rows, to_fetch = _batch_rows(items)
+    # Fetch missing weather for all locations at once
+    fetched = get_weather_many([loc for _, loc in to_fetch])
+    return jsonify({"results": _predict_batch(results, rows, to_fetch, fetched)})
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,331 @@
+"""
+Async serving mode for the Disaster Preparedness API.
+Weather-bound endpoints (/weather, /disaster-prediction and its batch
+variant) run as native aiohttp handlers: the OpenWeatherMap call awaits on
+an async client, so a slow upstream holds a socket instead of a thread,
+and the CPU-bound scoring runs on a small executor. Every other endpoint
+is served by the existing Flask app through a WSGI bridge on the same
+executor, so both modes expose the same API.
+
+Usage: python async_app.py [--host 0.0.0.0] [--port 5000]
+       python async_app.py --benchmark [--concurrency 500] [--delay 2]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import weather
+import weather_store
+import app as flask_app
+from app import (_batch_items, _batch_rows, _predict_batch, _predict_location,
+                 _prediction_input, _weather_inputs)
+
+# Threads for CPU-bound work and the WSGI bridge (not for upstream waits)
+EXECUTOR_WORKERS = int(os.getenv("ASYNC_EXECUTOR_WORKERS", 8))
+# Concurrent upstream connections; no longer bounded by threads
+ASYNC_WEATHER_POOL = int(os.getenv("ASYNC_WEATHER_POOL", 1000))
+
+HOP_BY_HOP = {"content-length", "transfer-encoding", "connection"}
+INVALID_JSON = {"message": "Request body must be valid JSON"}
+
+
+def _json(data, status=200):
+    return web.json_response(data, status=status, headers={"Access-Control-Allow-Origin": "*"})
+
+
+async def _offload(request, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(request.app["executor"], fn, *args)
+
+
+async def weather_handler(request):
+    loc = request.query.get("location")
+    if not loc and request.can_read_body:
+        try:
+            body = await request.json()
+        except ValueError:
+            return _json(INVALID_JSON, 400)
+        loc = body.get("location") if isinstance(body, dict) else None
+    if not loc:
+        return _json({"message": "location required"}, 400)
+    try:
+        return _json(await weather.get_weather_async(loc, request.app["weather_session"]))
+    except Exception as e:
+        return _json({"message": str(e)}, 502)
+
+
+async def disaster_prediction(request):
+    """Predict disaster risk based on location and weather."""
+    if request.method == "POST":
+        try:
+            data = await request.json() or {}
+        except ValueError:
+            return _json(INVALID_JSON, 400)
+    else:
+        data = request.query
+    try:
+        loc, temp, humidity, wind = _prediction_input(data)
+        if not loc:
+            return _json({"message": "location required"}, 400)
+
+        if temp is None or humidity is None or wind is None:
+            data = await weather.get_weather_async(loc, request.app["weather_session"])
+            temp, humidity, wind = _weather_inputs(data)
+        else:
+            temp, humidity, wind = float(temp), int(humidity), float(wind)
+
+        return _json(await _offload(request, _predict_location, loc, temp, humidity, wind))
+    except Exception as e:
+        print(f"Error in disaster_prediction: {e}")
+        return _json({"message": str(e)}, 500)
+
+
+async def disaster_prediction_batch(request):
+    """Batch prediction; missing weather is fetched concurrently on the event loop."""
+    try:
+        body = await request.json()
+    except ValueError:
+        return _json(INVALID_JSON, 400)
+    items, error = _batch_items(body)
+    if error:
+        return _json({"message": error}, 400)
+
+    results, rows, to_fetch = _batch_rows(items)
+    unique = list(dict.fromkeys(loc for _, loc in to_fetch))
+    session = request.app["weather_session"]
+    fetched = await asyncio.gather(*(weather.get_weather_async(loc, session) for loc in unique),
+                                   return_exceptions=True)
+    results = await _offload(request, _predict_batch, results, rows, to_fetch, dict(zip(unique, fetched)))
+    return _json({"results": results})
+
+
+def _call_wsgi(wsgi_app, environ):
+    """Run a WSGI app to completion: (status, headers, body)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = status, headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        # Streamed (NDJSON / paged) responses are buffered here
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return int(started["status"].split(" ", 1)[0]), started["headers"], body
+
+
+async def wsgi_bridge(request):
+    """Serve any other route with the Flask app on the executor."""
+    body = await request.read()
+    host, _, port = (request.host or "localhost").partition(":")
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": request.path,
+        "QUERY_STRING": request.query_string,
+        "SERVER_NAME": host,
+        "SERVER_PORT": port or ("443" if request.secure else "80"),
+        "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+        "REMOTE_ADDR": request.remote or "",
+        "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": request.scheme,
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in request.headers.items():
+        key = "HTTP_" + name.upper().replace("-", "_")
+        if key not in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    status, headers, payload = await _offload(request, _call_wsgi, flask_app.app.wsgi_app, environ)
+    response = web.Response(status=status, body=payload)
+    for name, value in headers:
+        if name.lower() not in HOP_BY_HOP:
+            response.headers.add(name, value)
+    return response
+
+
+async def _resources(application):
+    """Executor and the shared async weather session for the app's lifetime."""
+    application["executor"] = ThreadPoolExecutor(EXECUTOR_WORKERS, thread_name_prefix="async-app")
+    async with weather._async_session(ASYNC_WEATHER_POOL) as session:
+        application["weather_session"] = session
+        yield
+    application["executor"].shutdown(wait=False)
+
+
+def create_app():
+    application = web.Application()
+    application.cleanup_ctx.append(_resources)
+    application.router.add_get("/weather", weather_handler)
+    application.router.add_route("GET", "/disaster-prediction", disaster_prediction)
+    application.router.add_route("POST", "/disaster-prediction", disaster_prediction)
+    application.router.add_post("/disaster-prediction/batch", disaster_prediction_batch)
+    # Everything else (and CORS preflights) goes to the Flask app
+    application.router.add_route("*", "/{tail:.*}", wsgi_bridge)
+    return application
+
+
+async def _slow_upstream(delay):
+    """Fake OpenWeatherMap that answers after `delay` seconds."""
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return web.json_response({"name": request.query.get("q"),
+                                  "main": {"temp": 31.0, "humidity": 88}, "wind": {"speed": 14.0}})
+
+    server = web.Application()
+    server.router.add_get("/data/2.5/weather", handler)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+async def _fire(url, paths, timeout):
+    """Send all requests at once; (ok count, wall seconds)."""
+    import aiohttp
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as client:
+        async def one(path):
+            try:
+                async with client.get(url + path) as resp:
+                    await resp.read()
+                    return resp.status == 200
+            except Exception:
+                return False
+
+        start = time.perf_counter()
+        ok = await asyncio.gather(*(one(p) for p in paths))
+        return sum(ok), time.perf_counter() - start
+
+
+class _PeakThreads:
+    """Samples the process thread count while a load test runs."""
+
+    def __init__(self):
+        self.base = self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.02):
+            self.peak = max(self.peak, threading.active_count())
+
+    @property
+    def added(self):
+        return self.peak - self.base
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def _benchmark(concurrency, delay, sync_threads):
+    """Run the comparison against a fake upstream and a throwaway observation store."""
+    saved = weather.BASE_URL, weather.API_KEY, weather_store.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        weather_store.DB_PATH = os.path.join(tmp, "weather_observations.db")
+        try:
+            await _run_benchmark(concurrency, delay, sync_threads)
+        finally:
+            weather.BASE_URL, weather.API_KEY, weather_store.DB_PATH = saved
+
+
+async def _run_benchmark(concurrency, delay, sync_threads):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    upstream, upstream_port = await _slow_upstream(delay)
+    weather.BASE_URL = f"http://127.0.0.1:{upstream_port}/data/2.5/weather"
+    weather.API_KEY = weather.API_KEY or "benchmark"
+    timeout = delay * 3 + 10
+    print(f"[INFO] {concurrency} concurrent /disaster-prediction requests, "
+          f"upstream answers after {delay:.1f}s, distinct locations (no cache hits)")
+
+    def paths(tag):
+        return [f"/disaster-prediction?location={tag}-city-{i}" for i in range(concurrency)]
+
+    # Flask dev server: one thread per in-flight request
+    server = make_server("127.0.0.1", 0, flask_app.app, threaded=True, request_handler=QuietHandler)
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    with _PeakThreads() as threads:
+        ok, wall = await _fire(f"http://127.0.0.1:{server.server_port}", paths("sync"), timeout)
+    server.shutdown()
+    print(f"[INFO] flask threaded : {ok}/{concurrency} ok in {wall:.2f}s, +{threads.added} threads")
+
+    # Same Flask app behind a fixed worker pool (gunicorn --threads style)
+    server = make_server("127.0.0.1", 0, flask_app.app, threaded=False, request_handler=QuietHandler)
+    pool = ThreadPoolExecutor(sync_threads)
+    server.process_request = lambda req, addr: pool.submit(_handle_pooled, server, req, addr)
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    with _PeakThreads() as threads:
+        ok, wall = await _fire(f"http://127.0.0.1:{server.server_port}", paths("pool"), timeout)
+    server.shutdown()
+    pool.shutdown(wait=True, cancel_futures=True)
+    print(f"[INFO] flask {sync_threads:>3} threads: {ok}/{concurrency} ok in {wall:.2f}s, "
+          f"+{threads.added} threads")
+
+    # Async mode
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    with _PeakThreads() as threads:
+        ok, wall = await _fire(f"http://127.0.0.1:{runner.addresses[0][1]}", paths("async"), timeout)
+    await runner.cleanup()
+    print(f"[INFO] async          : {ok}/{concurrency} ok in {wall:.2f}s, +{threads.added} threads")
+    await upstream.cleanup()
+
+
+def _handle_pooled(server, request, client_address):
+    try:
+        server.finish_request(request, client_address)
+    except Exception:
+        server.handle_error(request, client_address)
+    finally:
+        server.shutdown_request(request)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare concurrent slow-upstream requests against the Flask server")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=2.0, help="fake upstream latency (seconds)")
+    parser.add_argument("--sync-threads", type=int, default=32,
+                        help="worker threads for the pooled Flask comparison")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        asyncio.run(_benchmark(args.concurrency, args.delay, args.sync_threads))
+    else:
+        web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,163 @@
 """
-Clean disaster dataset to extract state names only
+Clean disaster dataset to extract state names
+Superseded by etl.py (knowledge stage); kept as an entry point.
+
+Usage: python clean_data.py [--benchmark]
 """
-import pickle
+import re
+import sys
+
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
 
-# Load original data
-df = pickle.load(open("models/disaster_knowledge.pkl", "rb"))
-print(f"Original data: {len(df)} records")
+# Common state names in India
+STATES = [
+    'Tamil Nadu', 'Andhra Pradesh', 'Karnataka', 'Kerala', 'Maharashtra',
+    'Gujarat', 'Rajasthan', 'Uttar Pradesh', 'Madhya Pradesh', 'Bihar',
+    'West Bengal', 'Orissa', 'Punjab', 'Haryana', 'Delhi', 'Assam',
+    'Jharkhand', 'Chhattisgarh', 'Himachal Pradesh', 'Uttarakhand',
+    'Goa', 'Sikkim', 'Tripura', 'Meghalaya', 'Manipur', 'Nagaland',
+    'Mizoram', 'Arunachal Pradesh', 'Jammu and Kashmir', 'Telangana'
+]
+
+
+def _trie_pattern(words):
+    """Regex alternation for `words` factored into a prefix trie.
+
+    Python's regex engine tries alternatives one by one; sharing prefixes
+    means each position is tested against a single character class instead
+    of all 30 names.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(node[ch]) for ch in sorted(k for k in node if k)]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+# Single compiled matcher: a record separator or any (lowercased) state name
+STATE_PATTERN = re.compile("\n|" + _trie_pattern([s.lower() for s in STATES]))
+# Position in STATES decides the primary state when several match
+_STATE_RANK = {s.lower(): i for i, s in enumerate(STATES)}
+
+
+def _fallback_state(locations):
+    """First part before a comma, used when no known state is named."""
+    return locations.str.split(",", n=1).str[0].str.strip()
+
+
+def state_bridge(locations):
+    """Explode location strings into a row-per-state bridge table.
+
+    Args:
+        locations: Series of raw location strings
+
+    Returns a DataFrame with columns `record` (position in `locations`),
+    `State` and `primary` (True for the state the event is filed under),
+    ordered by record and then by STATES order. Every named state is kept,
+    so an event hitting three states yields three rows. Locations naming no
+    known state fall back to their first comma-separated part.
+
+    All locations are joined into one lowercased string and scanned with a
+    single findall; record ids come from counting separators, so there is
+    no per-row Python call.
+    """
+    locations = pd.Series(locations, dtype=object).reset_index(drop=True)
+    text = "\n".join(locations.fillna("").str.replace("\n", " ", regex=False)).lower() + "\n"
+    tokens = np.asarray(STATE_PATTERN.findall(text), dtype=object)
+    separator = tokens == "\n"
+    codes, names = pd.factorize(tokens[~separator])
+    ranks = np.asarray([_STATE_RANK[n] for n in names], dtype=np.int64)[codes]
+    # One integer key per (record, state): unique() dedupes and sorts in one step
+    keys = np.unique(np.cumsum(separator)[~separator] * len(STATES) + ranks)
+    matched = pd.DataFrame({"record": keys // len(STATES),
+                            "State": np.asarray(STATES, dtype=object)[keys % len(STATES)]})
+
+    rest = locations[locations.notna() & ~locations.index.isin(matched["record"])]
+    fallback = pd.DataFrame({"record": rest.index.to_numpy(), "State": _fallback_state(rest).to_numpy()})
+
+    bridge = pd.concat([matched, fallback], ignore_index=True)
+    bridge = bridge.sort_values("record", kind="stable").reset_index(drop=True)
+    bridge["primary"] = ~bridge["record"].duplicated()
+    return bridge
+
+
+def primary_states(locations, bridge=None):
+    """Primary state per location, aligned with `locations` (None if missing)."""
+    locations = pd.Series(locations)
+    if bridge is None:
+        bridge = state_bridge(locations)
+    primary = bridge[bridge["primary"]].set_index("record")["State"].reindex(range(len(locations)))
+    values = primary.to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    return pd.Series(values, index=locations.index, dtype=object)
+
 
-# Extract state names from complex location strings
 def extract_state(location_str):
-    """Extract primary state from location string"""
+    """Extract primary state from a single location string"""
     if pd.isna(location_str):
         return None
-    
-    # Common state names in India
-    states = [
-        'Tamil Nadu', 'Andhra Pradesh', 'Karnataka', 'Kerala', 'Maharashtra',
-        'Gujarat', 'Rajasthan', 'Uttar Pradesh', 'Madhya Pradesh', 'Bihar',
-        'West Bengal', 'Orissa', 'Punjab', 'Haryana', 'Delhi', 'Assam',
-        'Jharkhand', 'Chhattisgarh', 'Himachal Pradesh', 'Uttarakhand',
-        'Goa', 'Sikkim', 'Tripura', 'Meghalaya', 'Manipur', 'Nagaland',
-        'Mizoram', 'Arunachal Pradesh', 'Jammu and Kashmir', 'Telangana'
-    ]
-    
-    location_lower = location_str.lower()
-    
-    # Find first matching state
-    for state in states:
-        if state.lower() in location_lower:
-            return state
-    
-    # If no state found, return first part before comma
-    parts = location_str.split(',')
-    return parts[0].strip() if parts else location_str
-
-# Create new column with cleaned state names
-df['State'] = df['Location'].apply(extract_state)
-
-# Remove rows without state
-df_clean = df[df['State'].notna()].copy()
-
-print(f"Cleaned data: {len(df_clean)} records")
-print(f"Unique states: {df_clean['State'].nunique()}")
-print(f"States: {sorted(df_clean['State'].unique())}")
-
-# Encode states
-le_state = LabelEncoder()
-df_clean['location_encoded'] = le_state.fit_transform(df_clean['State'])
-
-# Drop original Location column, keep State
-df_clean = df_clean.drop(columns=['Location'])
-
-# Save cleaned data
-pickle.dump(df_clean, open("models/disaster_knowledge_clean.pkl", "wb"))
-pickle.dump(le_state, open("models/state_encoder.pkl", "wb"))
-
-print("\n✅ Saved:")
-print("  - models/disaster_knowledge_clean.pkl")
-print("  - models/state_encoder.pkl")
-
-# Show sample
-print("\nSample records:")
-print(df_clean[['State', 'Disaster Type', 'Start Year', 'Total Deaths']].head(10))
+    ranks = [_STATE_RANK[m] for m in STATE_PATTERN.findall(location_str.lower()) if m != "\n"]
+    if ranks:
+        return STATES[min(ranks)]
+    return location_str.split(',')[0].strip()
+
+
+def benchmark(path="dataset/disasterIND.csv", repeat=5):
+    """Time the old per-row substring loop against the single-pass matcher."""
+    import time
+
+    def legacy_extract_state(location_str):
+        if pd.isna(location_str):
+            return None
+        location_lower = location_str.lower()
+        for state in STATES:
+            if state.lower() in location_lower:
+                return state
+        parts = location_str.split(',')
+        return parts[0].strip() if parts else location_str
+
+    def legacy_all_states(location_str):
+        if pd.isna(location_str):
+            return ()
+        location_lower = location_str.lower()
+        return tuple(s for s in STATES if s.lower() in location_lower)
+
+    def best_of(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000, result
+
+    base = pd.read_csv(path, usecols=["Location"], dtype=object)["Location"]
+    for scale in (1, 100):
+        locations = pd.concat([base] * scale, ignore_index=True)
+        first_ms, legacy = best_of(lambda: locations.apply(legacy_extract_state))
+        all_ms, _ = best_of(lambda: locations.apply(legacy_all_states))
+        bridge_ms, bridge = best_of(lambda: state_bridge(locations))
+        primary = primary_states(locations, bridge)
+        same = bool((legacy.fillna("<none>") == primary.fillna("<none>")).all())
+        multi = int(bridge["record"].duplicated().groupby(bridge["record"]).any().sum())
+        print(f"[INFO] {len(locations)} rows | apply first match {first_ms:.1f} ms | "
+              f"apply all matches {all_ms:.1f} ms | single-pass bridge {bridge_ms:.1f} ms | "
+              f"{len(bridge)} bridge rows, {multi} multi-state events | primary identical: {same}")
+
+
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark()
+    else:
+        import etl
+        etl.main(["--stage", "records", "--stage", "knowledge"])
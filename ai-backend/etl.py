@@ -0,0 +1,321 @@
+"""
+Incremental ETL for the disaster knowledge base.
+Replaces the separate preparation scripts with one pipeline:
+
+    records    raw EM-DAT CSV -> per-event record store (read in chunks;
+               only new or changed `DisNo.` rows are transformed)
+    knowledge  record store -> knowledge-base pickles, encoders and the
+               columnar export
+    predictor  knowledge base -> disaster_predictor.joblib
+
+Every stage fingerprints its inputs and is skipped when they are unchanged.
+Encoders are append-only: existing classes keep their codes and new ones
+are added at the end.
+Outputs are untracked: the location-keyed pickles go to models/etl/ and
+the state-keyed ones (preferred by the knowledge base) to models/; the
+tracked models/*.pkl are never rewritten.
+
+Usage: python etl.py [--force] [--stage records|knowledge|predictor]
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from clean_data import primary_states, state_bridge
+from knowledge_base import STATE_BRIDGE_PATH
+
+SOURCE_PATHS = ["dataset/disasterIND.csv", "dataset/clean_disaster_data.csv"]
+KEY_COLUMN = "DisNo."
+RECORD_COLUMNS = ["Location", "Disaster Type", "Disaster Subtype", "Start Year",
+                  "Total Deaths", "Total Damage ('000 US$)"]
+# Free text for search, event coordinates and magnitude; NaN when the
+# source does not carry them
+DETAIL_COLUMNS = ["Event Name", "Associated Types"]
+GEO_COLUMNS = ["Latitude", "Longitude", "Magnitude", "Magnitude Scale"]
+OPTIONAL_COLUMNS = DETAIL_COLUMNS + GEO_COLUMNS
+KB_COLUMNS = RECORD_COLUMNS + OPTIONAL_COLUMNS
+# Columns derived by `_transform`; a store without them is rebuilt
+DERIVED_COLUMNS = ["State", "States"]
+# Read as plain object columns, matching the existing pickles
+TEXT_COLUMNS = [KEY_COLUMN, "Location", "Disaster Type", "Disaster Subtype"] + DETAIL_COLUMNS + ["Magnitude Scale"]
+CHUNK_ROWS = int(os.getenv("ETL_CHUNK_ROWS", 50_000))
+
+ETL_DIR = "models/etl"
+STATE_PATH = os.path.join(ETL_DIR, "etl_state.json")
+RECORDS_PATH = os.path.join(ETL_DIR, "records.pkl")
+
+# The location-keyed variant stays next to the record store: the tracked
+# models/ pickles are the shipped fallback and are never overwritten
+KNOWLEDGE_PATH = os.path.join(ETL_DIR, "disaster_knowledge.pkl")
+LOCATION_ENCODER_PATH = os.path.join(ETL_DIR, "location_encoder.pkl")
+SHIPPED_LOCATION_ENCODER_PATH = "models/location_encoder.pkl"
+CLEAN_KNOWLEDGE_PATH = "models/disaster_knowledge_clean.pkl"
+STATE_ENCODER_PATH = "models/state_encoder.pkl"
+
+
+def fingerprint(path):
+    """SHA-256 of a file's contents (None if it does not exist)."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_state():
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"stages": {}}
+
+
+def _save_state(state):
+    os.makedirs(ETL_DIR, exist_ok=True)
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+
+def _dump(obj, path):
+    """Pickle to a temp file and rename, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _load(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def stable_encoder(values, encoder=None):
+    """Fit a LabelEncoder without ever reassigning existing codes.
+
+    A fresh encoder is fitted normally (sorted classes). An existing one
+    keeps its classes in place and unseen values are appended; LabelEncoder
+    maps string classes through a lookup table, so unsorted classes still
+    transform correctly.
+    """
+    values = pd.Series(values).dropna().astype(str).unique()
+    if encoder is None:
+        return LabelEncoder().fit(values)
+    known = set(encoder.classes_)
+    new = sorted(v for v in values if v not in known)
+    if new:
+        encoder.classes_ = np.concatenate([np.asarray(encoder.classes_, dtype=object),
+                                           np.asarray(new, dtype=object)])
+    return encoder
+
+
+def _row_hashes(frame):
+    return pd.util.hash_pandas_object(frame[KB_COLUMNS], index=False).to_numpy()
+
+
+def _source_keys(chunk, hashes, seen):
+    """Event keys for a chunk: `DisNo.` when present, else content hash + occurrence."""
+    if KEY_COLUMN in chunk.columns:
+        return chunk[KEY_COLUMN].astype(str).to_numpy()
+    keys = []
+    for h in hashes:
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        keys.append(f"{h:016x}-{n}")
+    return np.asarray(keys, dtype=object)
+
+
+def _transform(rows):
+    """Derive per-event columns for new or changed rows only.
+
+    `State` is the primary state the event is filed under, `States` every
+    state its location names.
+    """
+    rows = rows.copy()
+    bridge = state_bridge(rows["Location"])
+    rows["State"] = primary_states(rows["Location"], bridge).to_numpy()
+    states = bridge.groupby("record")["State"].agg(tuple).reindex(range(len(rows)))
+    rows["States"] = [s if isinstance(s, tuple) else () for s in states]
+    return rows
+
+
+def build_records(source, previous=None, chunk_rows=CHUNK_ROWS):
+    """Read `source` in chunks and merge it into the previous record store.
+
+    Returns (records, stats). Unchanged events are reused from `previous`;
+    only new or changed rows go through `_transform`.
+    """
+    header = pd.read_csv(source, nrows=0).columns
+    usecols = [c for c in [KEY_COLUMN] + KB_COLUMNS if c in header]
+    if previous is not None and not set(KB_COLUMNS + DERIVED_COLUMNS) <= set(previous.columns):
+        previous = None
+    old_hash = previous["_row_hash"] if previous is not None else pd.Series(dtype="uint64")
+
+    parts, seen = [], {}
+    stats = {"rows": 0, "new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    dtypes = {c: object for c in TEXT_COLUMNS if c in usecols}
+    for chunk in pd.read_csv(source, usecols=usecols, dtype=dtypes, chunksize=chunk_rows):
+        chunk = chunk[chunk["Location"].notna()]
+        if chunk.empty:
+            continue
+        for col in OPTIONAL_COLUMNS:
+            if col not in chunk.columns:
+                chunk[col] = np.nan
+        hashes = _row_hashes(chunk)
+        keys = _source_keys(chunk, hashes, seen)
+        chunk = chunk.drop(columns=[KEY_COLUMN], errors="ignore")
+        chunk.index = pd.Index(keys, name=KEY_COLUMN)
+        chunk["_row_hash"] = hashes
+
+        new = ~chunk.index.isin(old_hash.index)
+        changed = ~new & (old_hash.reindex(chunk.index, fill_value=0).to_numpy() != hashes)
+        dirty = new | changed
+        stats["rows"] += len(chunk)
+        stats["new"] += int(new.sum())
+        stats["changed"] += int(changed.sum())
+        stats["unchanged"] += int((~dirty).sum())
+
+        fresh = _transform(chunk[dirty])
+        reused = previous.loc[chunk.index[~dirty]] if previous is not None else fresh.iloc[0:0]
+        parts.append(pd.concat([reused, fresh]).reindex(chunk.index))
+
+    records = pd.concat(parts) if parts else pd.DataFrame(columns=KB_COLUMNS + DERIVED_COLUMNS + ["_row_hash"])
+    if previous is not None:
+        stats["removed"] = int((~previous.index.isin(records.index)).sum())
+    return records, stats
+
+
+def build_knowledge(records):
+    """Build both knowledge-base variants with stable encoders.
+
+    Location variant: the original records (with coordinates) plus
+    `location_encoded`.
+    Clean variant: the same records keyed by the primary `State`, encoded
+    with the state encoder (`Location` is kept for full-text search).
+    Bridge: one row per (clean record position, state) for events that
+    name several states.
+    """
+    previous = _load(LOCATION_ENCODER_PATH)
+    if previous is None:
+        # First run: extend the shipped encoder so its codes never change
+        previous = _load(SHIPPED_LOCATION_ENCODER_PATH)
+    location_encoder = stable_encoder(records["Location"], previous)
+    knowledge = records[KB_COLUMNS].reset_index(drop=True)
+    knowledge["location_encoded"] = location_encoder.transform(knowledge["Location"].astype(str))
+
+    with_state = records[records["State"].notna()]
+    exploded = with_state["States"].reset_index(drop=True).explode().dropna()
+    bridge = pd.DataFrame({"record": exploded.index.to_numpy(dtype=np.int64),
+                           "State": exploded.to_numpy(dtype=object)})
+    bridge["primary"] = ~bridge["record"].duplicated()
+
+    state_encoder = stable_encoder(pd.concat([with_state["State"], bridge["State"]]),
+                                   _load(STATE_ENCODER_PATH))
+    clean = knowledge.loc[records["State"].notna().to_numpy()].copy()
+    clean["location_encoded"] = state_encoder.transform(with_state["State"].astype(str))
+    clean["State"] = with_state["State"].to_numpy()
+    clean = clean.reset_index(drop=True)
+    bridge["location_encoded"] = state_encoder.transform(bridge["State"].astype(str))
+    return knowledge, location_encoder, clean, state_encoder, bridge
+
+
+def _stage_records(force):
+    source = next((p for p in SOURCE_PATHS if os.path.exists(p)), None)
+    if source is None:
+        raise SystemExit(f"No source dataset found in {SOURCE_PATHS}")
+    previous = None if force else _load(RECORDS_PATH)
+    records, stats = build_records(source, previous)
+    _dump(records, RECORDS_PATH)
+    print(f"[OK] {source}: {stats['rows']} events "
+          f"({stats['new']} new, {stats['changed']} changed, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed)")
+    return [source], [RECORDS_PATH]
+
+
+def _stage_knowledge(force):
+    records = _load(RECORDS_PATH)
+    knowledge, location_encoder, clean, state_encoder, bridge = build_knowledge(records)
+    _dump(knowledge, KNOWLEDGE_PATH)
+    _dump(location_encoder, LOCATION_ENCODER_PATH)
+    _dump(clean, CLEAN_KNOWLEDGE_PATH)
+    _dump(bridge, STATE_BRIDGE_PATH)
+    _dump(state_encoder, STATE_ENCODER_PATH)
+
+    from kb_columnar import COLUMNAR_DIR, MANIFEST_PATH, export_columnar
+    export_columnar(clean, COLUMNAR_DIR, sources=[CLEAN_KNOWLEDGE_PATH, STATE_ENCODER_PATH, STATE_BRIDGE_PATH])
+    print(f"[OK] Knowledge base: {len(knowledge)} records, "
+          f"{len(location_encoder.classes_)} locations, {len(state_encoder.classes_)} states, "
+          f"{int((~bridge['primary']).sum())} extra state links")
+    return [RECORDS_PATH], [KNOWLEDGE_PATH, LOCATION_ENCODER_PATH, CLEAN_KNOWLEDGE_PATH,
+                            STATE_BRIDGE_PATH, STATE_ENCODER_PATH, MANIFEST_PATH]
+
+
+def _stage_predictor(force):
+    from prediction import MODEL_PATH as PREDICTOR_PATH, train_prediction_model
+    model = train_prediction_model(_load(CLEAN_KNOWLEDGE_PATH))
+    if model is None:
+        raise RuntimeError("prediction model training failed")
+    print(f"[OK] Trained prediction model -> {PREDICTOR_PATH}")
+    return [CLEAN_KNOWLEDGE_PATH], [PREDICTOR_PATH]
+
+
+# name -> (function, input paths used for the skip check)
+STAGES = {
+    "records": (_stage_records, lambda: [next((p for p in SOURCE_PATHS if os.path.exists(p)), SOURCE_PATHS[0])]),
+    "knowledge": (_stage_knowledge, lambda: [RECORDS_PATH]),
+    "predictor": (_stage_predictor, lambda: [CLEAN_KNOWLEDGE_PATH]),
+}
+
+
+def run(stages=None, force=False):
+    """Run the pipeline, skipping stages whose inputs and outputs are unchanged."""
+    state = _load_state()
+    for name in stages or STAGES:
+        stage, inputs = STAGES[name]
+        prints = {p: fingerprint(p) for p in inputs()}
+        last = state["stages"].get(name, {})
+        outputs_ok = last.get("outputs") and all(
+            fingerprint(p) == h for p, h in last["outputs"].items())
+        if not force and last.get("inputs") == prints and outputs_ok:
+            print(f"[INFO] Stage '{name}' up to date, skipping")
+            continue
+
+        start = time.perf_counter()
+        used, produced = stage(force)
+        state["stages"][name] = {
+            "inputs": {p: fingerprint(p) for p in used},
+            "outputs": {p: fingerprint(p) for p in produced},
+            "seconds": round(time.perf_counter() - start, 3),
+            "ran_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        _save_state(state)
+        print(f"[OK] Stage '{name}' done in {state['stages'][name]['seconds']:.2f}s")
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the disaster knowledge base incrementally")
+    parser.add_argument("--stage", action="append", choices=list(STAGES),
+                        help="run only this stage (repeatable)")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore fingerprints and rebuild from scratch (encoders stay stable)")
+    args = parser.parse_args(argv)
+    run(args.stage, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Spatial index over geolocated disaster events.
+Events with EM-DAT coordinates go into a ball tree with the haversine
+metric, built once when the knowledge base loads; radius and k-nearest
+queries then descend the tree instead of scanning every record.
+"""
+import numpy as np
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+LAT_COLUMN = "Latitude"
+LON_COLUMN = "Longitude"
+
+
+class GeoIndex:
+    """Ball tree (haversine) over the records that have coordinates.
+
+    `rows` holds each indexed point's position in the knowledge-base frame.
+    """
+
+    def __init__(self, lat, lon, rows):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.points = np.radians(np.column_stack([lat, lon])) if len(self.rows) else np.empty((0, 2))
+        self.tree = BallTree(self.points, metric="haversine") if len(self.rows) else None
+
+    @classmethod
+    def build(cls, df):
+        """Index every row of `df` with a valid latitude/longitude."""
+        if df is None or LAT_COLUMN not in df.columns or LON_COLUMN not in df.columns:
+            return cls([], [], [])
+        lat = np.asarray(df[LAT_COLUMN], dtype=np.float64)
+        lon = np.asarray(df[LON_COLUMN], dtype=np.float64)
+        ok = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        return cls(lat[ok], lon[ok], np.flatnonzero(ok))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _query_point(self, lat, lon):
+        return np.radians([[lat, lon]])
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """Rows within `radius_km` of (lat, lon), nearest first.
+
+        Returns (row positions, distances in km).
+        """
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ind, dist = self.tree.query_radius(self._query_point(lat, lon), r=radius_km / EARTH_RADIUS_KM,
+                                           return_distance=True, sort_results=True)
+        ind, dist = ind[0][:limit], dist[0][:limit]
+        return self.rows[ind], dist * EARTH_RADIUS_KM
+
+    def nearest(self, lat, lon, k=10):
+        """The `k` rows closest to (lat, lon), nearest first."""
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        dist, ind = self.tree.query(self._query_point(lat, lon), k=min(k, len(self.rows)))
+        return self.rows[ind[0]], dist[0] * EARTH_RADIUS_KM
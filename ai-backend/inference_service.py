@@ -0,0 +1,87 @@
+"""
+Micro-batching inference queue.
+Concurrent single-row prediction requests are collected for a short window
+and run through the model as one batch; each caller gets its own row back.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Longest a caller waits for its row (seconds); a stuck model must not hang requests
+PREDICT_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", 10))
+
+
+class MicroBatcher:
+    """Batch concurrent `predict(row)` calls into one `predict_fn(rows)` call.
+
+    Args:
+        predict_fn: function mapping an (n, features) array to n outputs
+        max_batch: flush once this many rows are waiting
+        max_wait_ms: flush this long after the first row of a batch arrived
+    """
+
+    def __init__(self, predict_fn, max_batch=64, max_wait_ms=2.0, name="micro-batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.stats = {"requests": 0, "batches": 0, "max_batch_seen": 0, "errors": 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, row) -> Future:
+        """Queue one feature row; the Future resolves to its output row."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=np.float32), future))
+        return future
+
+    def predict(self, row, timeout=PREDICT_TIMEOUT):
+        return self.submit(row).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            try:
+                # Inside the try: a row of the wrong shape fails the batch, not the worker
+                rows = np.stack([row for row, _ in batch])
+                outputs = self.predict_fn(rows)
+                if len(outputs) != len(batch):
+                    raise ValueError(f"predict_fn returned {len(outputs)} outputs for {len(batch)} rows")
+            except Exception as e:
+                self.stats["errors"] += 1
+                for _, future in batch:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                continue
+            for (_, future), out in zip(batch, outputs):
+                if future.set_running_or_notify_cancel():
+                    future.set_result(out)
@@ -0,0 +1,137 @@
+"""
+Columnar, memory-mappable knowledge-base format.
+Each column is stored as its own .npy file: numeric columns as raw arrays,
+string columns dictionary-encoded (integer codes + a category table in the
+manifest). Opening it memory-maps the files, so worker processes share the
+same page-cache pages instead of each unpickling a private DataFrame.
+
+Usage: python kb_columnar.py   (exports the current pickled knowledge base)
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+COLUMNAR_DIR = "models/knowledge_columnar"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_PATH = os.path.join(COLUMNAR_DIR, MANIFEST_NAME)
+
+
+def file_stamp(path):
+    """(size, mtime in ns) of a file, or None if it does not exist.
+
+    Cheap enough to check on every load, unlike hashing the pickles.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _codes_dtype(n_categories):
+    """Smallest code dtype, matching what pandas uses so codes stay mapped."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def export_columnar(df, out_dir=COLUMNAR_DIR, sources=()):
+    """Write `df` as per-column .npy files plus manifest.json.
+
+    `sources` are the files the export must stay consistent with (the
+    pickled records it came from, the encoder and bridge built with them);
+    their size and mtime go into the manifest. Files get a fresh suffix on
+    every export and the manifest is replaced last, so processes that still
+    map the previous version are unaffected.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = f"{time.time_ns():x}"
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        filename = f"col{i:03d}.{stamp}.npy"
+        entry = {"name": str(name), "file": filename}
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            values = series.to_numpy()
+            entry.update(kind="numeric", dtype=str(values.dtype))
+        else:
+            cat = series.astype("category").cat
+            categories = [str(c) for c in cat.categories]
+            values = cat.codes.to_numpy().astype(_codes_dtype(len(categories)))
+            entry.update(kind="category", dtype=str(values.dtype), categories=categories)
+        np.save(os.path.join(out_dir, filename), np.ascontiguousarray(values))
+        columns.append(entry)
+
+    manifest = {"rows": len(df), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "sources": {path: file_stamp(path) for path in sources}, "columns": columns}
+    tmp = os.path.join(out_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST_NAME))
+
+    # Old column files can go: mapped pages stay valid until unmapped
+    keep = {c["file"] for c in columns}
+    for filename in os.listdir(out_dir):
+        if filename.endswith(".npy") and filename not in keep:
+            os.remove(os.path.join(out_dir, filename))
+    return manifest
+
+
+def load_columnar(manifest_path=MANIFEST_PATH):
+    """Open the columnar knowledge base as a DataFrame backed by memory maps.
+
+    String columns come back as categoricals whose codes are the mapped
+    arrays; numeric columns are the mapped arrays themselves (read-only).
+    Raises ValueError when a source file changed since the export (the
+    caller should load the pickles instead).
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if not manifest.get("sources"):
+        raise ValueError("manifest records no source files")
+    stale = [path for path, stamp in manifest["sources"].items() if file_stamp(path) != stamp]
+    if stale:
+        raise ValueError(f"{', '.join(stale)} changed since the export")
+    base = os.path.dirname(manifest_path)
+    data = {}
+    for col in manifest["columns"]:
+        values = np.load(os.path.join(base, col["file"]), mmap_mode="r")
+        if col["kind"] == "category":
+            data[col["name"]] = pd.Categorical.from_codes(values, categories=col["categories"], validate=False)
+        else:
+            data[col["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+if __name__ == "__main__":
+    import pickle
+    from knowledge_base import KNOWLEDGE_PATHS
+
+    for path in KNOWLEDGE_PATHS:
+        if os.path.exists(path):
+            break
+    else:
+        raise SystemExit("No pickled knowledge base found in models/")
+
+    t = time.perf_counter()
+    with open(path, "rb") as f:
+        df = pickle.load(f)
+    pickle_time = time.perf_counter() - t
+    print(f"[OK] Loaded {len(df)} records from {path} in {pickle_time*1000:.1f} ms "
+          f"({df.memory_usage(deep=True).sum() / 1024:.0f} KiB private)")
+
+    from knowledge_base import ENCODER_PATHS, STATE_BRIDGE_PATH
+    encoder = next((p for p in ENCODER_PATHS if os.path.exists(p)), None)
+    sources = [p for p in (path, encoder, STATE_BRIDGE_PATH) if p and os.path.exists(p)]
+    manifest = export_columnar(df, sources=sources)
+    print(f"[OK] Exported {len(manifest['columns'])} columns to {COLUMNAR_DIR}")
+
+    t = time.perf_counter()
+    mapped = load_columnar()
+    mmap_time = time.perf_counter() - t
+    print(f"[OK] Opened columnar knowledge base in {mmap_time*1000:.1f} ms")
+    print(mapped.dtypes)
@@ -0,0 +1,159 @@
+"""
+Shared-memory knowledge-base segments for pre-forked workers.
+Same layout idea as kb_columnar, but in POSIX shared memory instead of
+files: numeric columns are raw arrays, string columns are integer codes
+plus their distinct strings as one packed UTF-8 buffer with an offsets
+array. Readers map the segment read-only and build frames on top of it
+without copying, so no per-row Python objects exist in any worker.
+
+One publish creates two segments: `<name>` with the buffers and
+`<name>.meta` with the JSON layout.
+"""
+import json
+import mmap
+import os
+import secrets
+
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+from kb_columnar import _codes_dtype
+
+ALIGN = 64
+
+
+def _pack_strings(values):
+    """Concatenate strings into (UTF-8 bytes, int64 end offsets)."""
+    encoded = [str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data, offsets):
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+class _Layout:
+    """Collects arrays to place in one segment at aligned offsets."""
+
+    def __init__(self):
+        self.arrays = []
+        self.size = 0
+
+    def add(self, values):
+        values = np.ascontiguousarray(values)
+        offset = -(-self.size // ALIGN) * ALIGN
+        self.arrays.append((offset, values))
+        self.size = offset + values.nbytes
+        return {"offset": offset, "dtype": values.dtype.str, "count": int(values.size)}
+
+    def add_strings(self, values):
+        data, offsets = _pack_strings(values)
+        return {"data": self.add(data), "offsets": self.add(offsets)}
+
+
+def _frame_layout(layout, df):
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        entry = {"name": str(name)}
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            entry.update(kind="numeric", values=layout.add(series.to_numpy()))
+        else:
+            cat = series.astype("category").cat
+            entry.update(kind="category",
+                         codes=layout.add(cat.codes.to_numpy().astype(_codes_dtype(len(cat.categories)))),
+                         categories=layout.add_strings(cat.categories))
+        columns.append(entry)
+    return {"columns": columns, "rows": len(df)}
+
+
+class SharedSegments:
+    """Owner handle for one published knowledge base (creator side)."""
+
+    def __init__(self, name, data, meta_segment, meta):
+        self.name = name
+        self.meta = meta
+        self._segments = [data, meta_segment]
+
+    def unlink(self):
+        """Remove the segments; processes that still map them are unaffected."""
+        for segment in self._segments:
+            try:
+                segment.close()
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments = []
+
+
+def publish(frames, strings=None, meta=None, name=None):
+    """Copy DataFrames and string lists into new shared-memory segments.
+
+    Args:
+        frames: name -> DataFrame
+        strings: name -> list of strings (e.g. encoder classes)
+        meta: extra JSON-serializable metadata stored with the layout
+
+    Returns a SharedSegments handle; its `name` is what readers attach to.
+    """
+    name = name or f"kb-{os.getpid()}-{secrets.token_hex(4)}"
+    layout = _Layout()
+    manifest = {
+        "frames": {key: _frame_layout(layout, df) for key, df in frames.items() if df is not None},
+        "strings": {key: layout.add_strings(values) for key, values in (strings or {}).items()},
+        "meta": meta or {},
+    }
+
+    data = shared_memory.SharedMemory(name=name, create=True, size=max(layout.size, 1))
+    for offset, values in layout.arrays:
+        data.buf[offset:offset + values.nbytes] = values.reshape(-1).view(np.uint8)
+    encoded = json.dumps(manifest).encode("utf-8")
+    meta_segment = shared_memory.SharedMemory(name=name + ".meta", create=True, size=len(encoded))
+    meta_segment.buf[:len(encoded)] = encoded
+    return SharedSegments(name, data, meta_segment, manifest)
+
+
+def _map_readonly(name):
+    """Read-only mapping of a segment (arrays built on it are not writeable)."""
+    path = os.path.join("/dev/shm", name)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # No /dev/shm (e.g. macOS): attach normally and hand out read-only views
+    segment = shared_memory.SharedMemory(name=name)
+    return segment.buf.toreadonly()
+
+
+def _array(buf, spec):
+    return np.frombuffer(buf, dtype=np.dtype(spec["dtype"]), count=spec["count"], offset=spec["offset"])
+
+
+def attach(name):
+    """Map a published knowledge base read-only.
+
+    Returns (frames, strings, meta): DataFrames whose numeric columns and
+    categorical codes are views of the shared segment, the string lists,
+    and the metadata passed to `publish`.
+    """
+    meta_buf = _map_readonly(name + ".meta")
+    manifest = json.loads(bytes(meta_buf).rstrip(b"\0").decode("utf-8"))
+    buf = _map_readonly(name)
+
+    def strings(spec):
+        return _unpack_strings(_array(buf, spec["data"]), _array(buf, spec["offsets"]))
+
+    frames = {}
+    for key, layout in manifest["frames"].items():
+        data = {}
+        for col in layout["columns"]:
+            if col["kind"] == "category":
+                data[col["name"]] = pd.Categorical.from_codes(
+                    _array(buf, col["codes"]), categories=strings(col["categories"]), validate=False)
+            else:
+                data[col["name"]] = _array(buf, col["values"])
+        frames[key] = pd.DataFrame(data, copy=False)
+    return frames, {key: strings(spec) for key, spec in manifest["strings"].items()}, manifest["meta"]
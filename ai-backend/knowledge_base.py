@@ -0,0 +1,296 @@
+"""
+Historical disaster knowledge base.
+Loads the records (shared memory when published by serve.py, else the
+memory-mapped columnar format when exported, pickle otherwise) and location
+encoder once, indexes the rows by state and keeps each state's JSON
+response ready to send.
+"""
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from analytics_cube import StatsCube
+from geo_index import GeoIndex
+from search_index import SearchIndex
+from kb_columnar import MANIFEST_PATH, load_columnar
+import kb_shared
+from location_resolver import LocationResolver
+from model_registry import registry
+
+KNOWLEDGE_PATHS = ["models/disaster_knowledge_clean.pkl", "models/disaster_knowledge.pkl"]
+ENCODER_PATHS = ["models/state_encoder.pkl", "models/location_encoder.pkl"]
+# Row-per-state links for events that name several states (built by etl.py)
+STATE_BRIDGE_PATH = "models/disaster_state_bridge.pkl"
+
+# Columns returned as integers instead of floats
+INT_COLUMNS = ["Start Year", "Total Deaths"]
+
+# Every file the knowledge base is loaded from (watched for hot reload)
+ARTIFACT_PATHS = [MANIFEST_PATH] + KNOWLEDGE_PATHS + ENCODER_PATHS + [STATE_BRIDGE_PATH]
+
+# Name of a shared-memory knowledge base published by serve.py
+SHARED_MEMORY_ENV = "KB_SHARED_MEMORY"
+
+# Rows serialized per step when streaming records
+STREAM_CHUNK_ROWS = 256
+
+
+def _load_first(paths, label):
+    """Unpickle the first readable file in `paths`, returning (obj, path)."""
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                obj = pickle.load(f)
+            return obj, path
+        except Exception as e:
+            print(f"[WARNING] Could not load {label} from {path}: {e}")
+    return None, None
+
+
+def clean_records(frame):
+    """Convert a DataFrame slice into JSON-ready records (NaN -> None)."""
+    frame = frame.drop(columns=["location_encoded"], errors="ignore")
+    out = frame.astype(object).where(frame.notna(), None)
+    for col in INT_COLUMNS:
+        if col in out.columns:
+            ints = [None if v is None else int(v) for v in out[col]]
+            out[col] = pd.Series(ints, index=out.index, dtype=object)
+    return out.to_dict(orient="records")
+
+
+class KnowledgeBase:
+    """Disaster records, location encoder and the indexes built over them at load."""
+
+    def __init__(self, df, encoder, sources=(), bridge=None):
+        self.df = df if df is not None else pd.DataFrame()
+        self.encoder = encoder
+        self.bridge = bridge if self._bridge_matches(bridge) else None
+        self.sources = tuple(sources)
+        self.resolver = LocationResolver(encoder.classes_) if encoder is not None else None
+        self.partitions = self._partition()
+        self.payloads = {
+            name: json.dumps(clean_records(self.records(name))).encode("utf-8")
+            for name in self.partitions
+        }
+        self.year_index = self._index_years()
+        self.type_names, self.type_bitmaps = self._index_types()
+        self.stats = StatsCube.build(self.df, self.partitions)
+        self.geo = GeoIndex.build(self.df)
+        self.search = SearchIndex.build(self.df)
+
+    @property
+    def available(self):
+        return self.encoder is not None and not self.df.empty
+
+    def _bridge_matches(self, bridge):
+        """The state bridge only applies to the state-keyed frame it was built with."""
+        return (bridge is not None and len(bridge) > 0 and "State" in self.df.columns
+                and int(bridge["record"].max()) < len(self.df))
+
+    def _partition(self):
+        """Map each state name to its row positions once instead of masking per request.
+
+        Positions rather than DataFrame slices, so a memory-mapped frame is
+        not copied into per-state private memory. With a state bridge, an
+        event is listed under every state it names, not just its primary one.
+        """
+        if self.df.empty:
+            return {}
+        if self.bridge is not None:
+            records = self.bridge["record"].to_numpy()
+            groups = self.bridge.groupby("State", sort=False, observed=True).indices
+            return {str(name): records[rows] for name, rows in groups.items()}
+        if "State" in self.df.columns:
+            groups = self.df.groupby("State", sort=False, observed=True).indices
+            return {str(name): rows for name, rows in groups.items()}
+        if "location_encoded" in self.df.columns and self.encoder is not None:
+            classes = self.encoder.classes_
+            groups = self.df.groupby("location_encoded", sort=False).indices
+            return {
+                str(classes[code]): rows
+                for code, rows in groups.items()
+                if 0 <= code < len(classes)
+            }
+        return {}
+
+    def _index_years(self):
+        """Per state: Start Year values sorted ascending and the matching row positions."""
+        if "Start Year" not in self.df.columns:
+            return {}
+        years = pd.to_numeric(self.df["Start Year"], errors="coerce").to_numpy(dtype=np.float64)
+        index = {}
+        for name, rows in self.partitions.items():
+            order = np.argsort(years[rows], kind="stable")
+            index[name] = (years[rows][order], rows[order])
+        return index
+
+    def _index_types(self):
+        """Casefolded disaster type -> display name, and -> boolean row bitmap."""
+        if "Disaster Type" not in self.df.columns:
+            return {}, {}
+        codes, uniques = pd.factorize(self.df["Disaster Type"])
+        names = {str(t).casefold(): str(t) for t in uniques}
+        bitmaps = {str(t).casefold(): codes == i for i, t in enumerate(uniques)}
+        return names, bitmaps
+
+    def resolve_type(self, name):
+        """Known disaster type key for `name` ("floods" -> "flood"), or None."""
+        key = name.strip().casefold()
+        if key in self.type_bitmaps:
+            return key
+        if key.endswith("s") and key[:-1] in self.type_bitmaps:
+            return key[:-1]
+        return None
+
+    def select(self, location, from_year=None, to_year=None, types=None):
+        """Row positions for `location` within a year range and of given types.
+
+        Two binary searches on the state's year-sorted positions, then a
+        bitmap gather per type; the result is ordered by Start Year.
+        """
+        index = self.year_index.get(location)
+        if index is None:
+            return np.empty(0, dtype=np.int64)
+        years, rows = index
+        lo = 0 if from_year is None else int(np.searchsorted(years, from_year, "left"))
+        hi = len(years) if to_year is None else int(np.searchsorted(years, to_year, "right"))
+        rows = rows[lo:hi]
+        if types:
+            mask = np.zeros(len(rows), dtype=bool)
+            for key in types:
+                mask |= self.type_bitmaps[key][rows]
+            rows = rows[mask]
+        return rows
+
+    def records(self, location):
+        """Return the raw DataFrame rows for `location` (empty if unknown)."""
+        rows = self.partitions.get(location)
+        return self.df.take(rows) if rows is not None else self.df.iloc[0:0]
+
+    def records_at(self, rows):
+        """Cleaned records at the given row positions, in that order."""
+        return clean_records(self.df.take(rows))
+
+    def columns(self):
+        """Public record columns (the encoded location is internal)."""
+        return [c for c in self.df.columns if c != "location_encoded"]
+
+    def iter_rows(self, rows, fields=None, start=0, limit=None):
+        """Yield cleaned records for the row positions `rows` one at a time.
+
+        Args:
+            rows: row positions, e.g. a partition or a `select()` result
+            fields: optional list of columns to project
+            start: offset within `rows` (the cursor)
+            limit: maximum number of records, None for all
+
+        Rows are cleaned in small chunks so memory stays flat however many
+        records are selected.
+        """
+        stop = len(rows) if limit is None else min(len(rows), start + limit)
+        frame = self.df[fields] if fields else self.df
+        for lo in range(start, stop, STREAM_CHUNK_ROWS):
+            yield from clean_records(frame.take(rows[lo:min(lo + STREAM_CHUNK_ROWS, stop)]))
+
+    def iter_records(self, location, fields=None, start=0, limit=None):
+        """Yield cleaned records for `location` (see `iter_rows`)."""
+        rows = self.partitions.get(location, np.empty(0, dtype=np.int64))
+        return self.iter_rows(rows, fields=fields, start=start, limit=limit)
+
+    def payload(self, location):
+        """Return the pre-serialized JSON bytes for `location`, or None."""
+        return self.payloads.get(location)
+
+    def resident_bytes(self):
+        """Approximate memory held by records and cached payloads (mapped columns included)."""
+        total = int(self.df.memory_usage(deep=True).sum()) + sum(len(p) for p in self.payloads.values())
+        if self.bridge is not None:
+            total += int(self.bridge.memory_usage(deep=True).sum())
+        return total + self.search.resident_bytes()
+
+
+def _load_records():
+    """Open the columnar knowledge base if exported, else unpickle it."""
+    if os.path.exists(MANIFEST_PATH):
+        try:
+            return load_columnar(MANIFEST_PATH), MANIFEST_PATH
+        except Exception as e:
+            print(f"[WARNING] Could not open columnar knowledge base ({e}), using the pickle")
+    return _load_first(KNOWLEDGE_PATHS, "knowledge base")
+
+
+def artifact_mtimes():
+    """Modification times of ARTIFACT_PATHS (None for missing files)."""
+    return [os.path.getmtime(p) if os.path.exists(p) else None for p in ARTIFACT_PATHS]
+
+
+def _load_from_disk():
+    """(records, encoder, bridge, source paths) from the files in models/."""
+    df, df_path = _load_records()
+    if df is not None:
+        print(f"[OK] Loaded {len(df)} disaster records from {df_path}")
+    encoder, enc_path = _load_first(ENCODER_PATHS, "location encoder")
+    bridge, bridge_path = None, None
+    if os.path.exists(STATE_BRIDGE_PATH):
+        bridge, bridge_path = _load_first([STATE_BRIDGE_PATH], "state bridge")
+    return df, encoder, bridge, [p for p in (df_path, enc_path, bridge_path) if p]
+
+
+def publish_shared(name=None):
+    """Load the knowledge base from disk into shared memory (see kb_shared).
+
+    Returns the owning kb_shared.SharedSegments; set SHARED_MEMORY_ENV to
+    its name so `load_knowledge_base` attaches instead of reading files.
+    """
+    df, encoder, bridge, sources = _load_from_disk()
+    strings = {"encoder_classes": list(encoder.classes_)} if encoder is not None else {}
+    meta = {"sources": sources, "mtimes": artifact_mtimes()}
+    return kb_shared.publish({"records": df, "bridge": bridge}, strings, meta, name)
+
+
+def _load_shared(name):
+    """Attach to a shared knowledge base, or None if missing or stale."""
+    try:
+        frames, strings, meta = kb_shared.attach(name)
+    except Exception as e:
+        print(f"[WARNING] Could not attach shared knowledge base '{name}': {e}")
+        return None
+    if meta.get("mtimes") != artifact_mtimes():
+        print(f"[WARNING] Shared knowledge base '{name}' is older than models/, loading from disk")
+        return None
+    encoder = None
+    if "encoder_classes" in strings:
+        encoder = LabelEncoder()
+        encoder.classes_ = np.asarray(strings["encoder_classes"], dtype=object)
+    df = frames.get("records")
+    if df is not None:
+        print(f"[OK] Attached {len(df)} disaster records from shared memory '{name}'")
+    sources = [f"shm:{name} ({p})" for p in meta.get("sources", [])]
+    return df, encoder, frames.get("bridge"), sources
+
+
+def load_knowledge_base():
+    """Load the knowledge base (shared memory or disk) and build its indexes."""
+    shared = os.getenv(SHARED_MEMORY_ENV)
+    loaded = _load_shared(shared) if shared else None
+    df, encoder, bridge, sources = loaded or _load_from_disk()
+    if encoder is not None:
+        print(f"[OK] Loaded location encoder with {len(encoder.classes_)} classes")
+        print(f"[INFO] Available states: {list(encoder.classes_)[:10]}...")
+    kb = KnowledgeBase(df, encoder, sources, bridge)
+    if kb.bridge is not None:
+        print(f"[OK] Linked {int((~kb.bridge['primary']).sum())} secondary event-state pairs")
+    print(f"[OK] Indexed {len(kb.partitions)} locations")
+    return kb
+
+
+registry.register("knowledge_base", ARTIFACT_PATHS, lambda paths: load_knowledge_base())
+
+
+def get_knowledge_base():
+    """Return the current knowledge base (hot-swapped by the model registry)."""
+    return registry.get("knowledge_base") or KnowledgeBase(None, None)
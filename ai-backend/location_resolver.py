@@ -0,0 +1,161 @@
+"""
+Location name resolution and autocomplete.
+Builds lookup structures once from the location encoder classes so that
+resolving a user-typed location never scans the class list.
+"""
+from bisect import bisect_left
+from functools import lru_cache
+
+# Common city names -> state they belong to
+CITY_ALIASES = {
+    "mumbai": "Maharashtra", "bombay": "Maharashtra", "pune": "Maharashtra",
+    "nagpur": "Maharashtra", "nashik": "Maharashtra",
+    "chennai": "Tamil Nadu", "coimbatore": "Tamil Nadu", "madurai": "Tamil Nadu",
+    "kolkata": "West Bengal", "calcutta": "West Bengal", "darjeeling": "West Bengal",
+    "bengaluru": "Karnataka", "bangalore": "Karnataka", "mysore": "Karnataka",
+    "mangalore": "Karnataka",
+    "hyderabad": "Telangana", "warangal": "Telangana",
+    "visakhapatnam": "Andhra Pradesh", "vijayawada": "Andhra Pradesh",
+    "ahmedabad": "Gujarat", "surat": "Gujarat", "vadodara": "Gujarat", "rajkot": "Gujarat",
+    "jaipur": "Rajasthan", "jodhpur": "Rajasthan", "udaipur": "Rajasthan",
+    "lucknow": "Uttar Pradesh", "kanpur": "Uttar Pradesh", "varanasi": "Uttar Pradesh",
+    "agra": "Uttar Pradesh", "prayagraj": "Uttar Pradesh", "allahabad": "Uttar Pradesh",
+    "bhopal": "Madhya Pradesh", "indore": "Madhya Pradesh", "jabalpur": "Madhya Pradesh",
+    "patna": "Bihar", "gaya": "Bihar",
+    "bhubaneswar": "Orissa", "cuttack": "Orissa", "puri": "Orissa", "odisha": "Orissa",
+    "thiruvananthapuram": "Kerala", "trivandrum": "Kerala", "kochi": "Kerala",
+    "cochin": "Kerala", "kozhikode": "Kerala",
+    "guwahati": "Assam", "dibrugarh": "Assam",
+    "chandigarh": "Punjab", "amritsar": "Punjab", "ludhiana": "Punjab",
+    "gurgaon": "Haryana", "gurugram": "Haryana",
+    "new delhi": "Delhi",
+    "dehradun": "Uttarakhand", "shimla": "Himachal Pradesh",
+    "srinagar": "Jammu and Kashmir", "jammu": "Jammu and Kashmir",
+    "ranchi": "Jharkhand", "raipur": "Chhattisgarh", "panaji": "Goa",
+    "gangtok": "Sikkim", "agartala": "Tripura", "shillong": "Meghalaya",
+    "imphal": "Manipur", "kohima": "Nagaland", "aizawl": "Mizoram",
+    "itanagar": "Arunachal Pradesh",
+}
+
+NGRAM_SIZE = 3
+TRIE_BUCKET = 20   # completions kept per trie node
+CACHE_SIZE = 4096
+
+
+def _fold(text):
+    return " ".join(str(text).casefold().split())
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class LocationResolver:
+    """Resolve free-text locations to encoder classes.
+
+    Lookup order: exact (case-folded) name, city alias whose state is an
+    exact class, name prefix, substring via an n-gram index, then a loose
+    match of the alias's state. Results are LRU cached per query.
+    """
+
+    def __init__(self, classes, aliases=None):
+        self.classes = [str(c) for c in classes]
+        self.codes = {name: code for code, name in enumerate(self.classes)}
+        self.folded = [_fold(name) for name in self.classes]
+        self.exact = {}
+        for code, key in enumerate(self.folded):
+            self.exact.setdefault(key, code)
+
+        # Prefix trie: nested dicts, each node keeps its first completions
+        self.trie = {}
+        for code in sorted(range(len(self.classes)), key=lambda c: self.folded[c]):
+            self._trie_insert(self.folded[code], code)
+
+        # n-gram -> set of class codes (grams of length 1..n so short queries work)
+        self.ngrams = {}
+        for code, key in enumerate(self.folded):
+            for n in range(1, NGRAM_SIZE + 1):
+                for gram in _grams(key, n):
+                    self.ngrams.setdefault(gram, set()).add(code)
+
+        self.aliases = {_fold(k): v for k, v in (aliases or CITY_ALIASES).items()}
+        self.alias_keys = sorted(self.aliases)
+        self.resolve = lru_cache(maxsize=CACHE_SIZE)(self._resolve)
+
+    def _trie_insert(self, key, code):
+        node = self.trie
+        for ch in key:
+            node = node.setdefault(ch, {"": []})
+            if len(node[""]) < TRIE_BUCKET:
+                node[""].append(code)
+
+    def _prefix(self, key):
+        node = self.trie
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return node.get("", [])
+
+    def _contains(self, key):
+        """Codes whose folded name contains `key`, in class order."""
+        n = min(NGRAM_SIZE, len(key))
+        candidates = None
+        for gram in _grams(key, n):
+            codes = self.ngrams.get(gram)
+            if not codes:
+                return []
+            candidates = codes if candidates is None else candidates & codes
+        return [c for c in sorted(candidates or ()) if key in self.folded[c]]
+
+    def _match(self, key):
+        code = self.exact.get(key)
+        if code is not None:
+            return code
+        prefixed = self._prefix(key)
+        if prefixed:
+            return min(prefixed)
+        contained = self._contains(key)
+        return contained[0] if contained else None
+
+    def _resolve(self, query):
+        key = _fold(query)
+        if not key:
+            return None
+        code = self.exact.get(key)
+        target = _fold(self.aliases[key]) if key in self.aliases else None
+        if code is None and target:
+            # A state alias only wins when the state itself is a class
+            code = self.exact.get(target)
+        if code is None:
+            code = self._match(key)
+        if code is None and target:
+            code = self._match(target)
+        return self.classes[code] if code is not None else None
+
+    def encode(self, name):
+        """Encoder code for a resolved class name (None if unknown)."""
+        return self.codes.get(name)
+
+    def suggest(self, query, limit=10):
+        """Autocomplete: prefix matches first, then aliases, then substrings."""
+        key = _fold(query)
+        if not key:
+            return []
+        seen = []
+        for code in self._prefix(key):
+            if len(seen) >= limit:
+                return seen
+            seen.append(self.classes[code])
+        i = bisect_left(self.alias_keys, key)
+        while i < len(self.alias_keys) and self.alias_keys[i].startswith(key):
+            name = self.resolve(self.aliases[self.alias_keys[i]])
+            if name and name not in seen:
+                seen.append(name)
+            i += 1
+        for code in self._contains(key):
+            if len(seen) >= limit:
+                break
+            if self.classes[code] not in seen:
+                seen.append(self.classes[code])
+        return seen[:limit]
@@ -4,17 +4,32 @@ Predicts disaster risk based on 7-day weather patterns
 """
 import numpy as np
 import pandas as pd
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import LSTM, Dense, Dropout
 from sklearn.preprocessing import MinMaxScaler
 import pickle
 import os
+from model_registry import registry
+from risk_rules import death_risk_class
 
 MODEL_PATH = "models/lstm_disaster.h5"
 SCALER_PATH = "models/weather_scaler.pkl"
+NUMPY_MODEL_PATH = "models/lstm_numpy.npz"
+
+# "keras" (TensorFlow) or "numpy" (exported weights, no TensorFlow import)
+LSTM_BACKEND = os.getenv("LSTM_BACKEND", "keras")
+
+SEQ_LEN = 7
+N_FEATURES = 4
+
+RISK_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+COLORS = ['#4CAF50', '#FFC107', '#FF9800', '#F44336']
+EMOJIS = ['✅', '⚠', '⚠⚠', '🚨']
+
 
 def create_lstm_model():
     """Build LSTM model architecture"""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    
     model = Sequential([
         LSTM(64, return_sequences=True, input_shape=(7, 4)),  # 7 days, 4 features
         Dropout(0.3),
@@ -32,32 +47,38 @@ def prepare_training_data():
     # Format: [temp, humidity, wind, pressure] for 7 consecutive days
     # Label: 0=LOW, 1=MEDIUM, 2=HIGH, 3=CRITICAL
     
-    # Example training data structure
-    sequences = []
-    labels = []
-    
     # Simulate training data (replace with real historical data)
-    for i in range(1000):
-        # Normal weather -> LOW risk
-        if i < 700:
-            seq = np.random.normal([25, 60, 5, 1013], [5, 10, 2, 5], (7, 4))
-            label = 0
-        # Extreme weather -> HIGH/CRITICAL risk
-        elif i < 900:
-            seq = np.random.normal([35, 85, 15, 1000], [3, 5, 3, 10], (7, 4))
-            label = 2
-        else:
-            seq = np.random.normal([40, 95, 25, 990], [2, 3, 5, 5], (7, 4))
-            label = 3
-        
-        sequences.append(seq)
-        labels.append(label)
-    
-    X = np.array(sequences)
+    # (count, mean, std, label) per weather regime, drawn one regime at a time
+    regimes = [
+        (700, [25, 60, 5, 1013], [5, 10, 2, 5], 0),   # Normal weather -> LOW risk
+        (200, [35, 85, 15, 1000], [3, 5, 3, 10], 2),  # Extreme weather -> HIGH risk
+        (100, [40, 95, 25, 990], [2, 3, 5, 5], 3),    # Severe weather -> CRITICAL risk
+    ]
+    X = np.concatenate([np.random.normal(mean, std, (n, SEQ_LEN, N_FEATURES)) for n, mean, std, _ in regimes])
+    labels = np.repeat([label for _, _, _, label in regimes], [n for n, _, _, _ in regimes])
     y = np.eye(4)[labels]  # One-hot encode
     
     return X, y
 
+
+def _scale_in_place(X, scaler):
+    """Apply a fitted MinMaxScaler without allocating a scaled copy."""
+    flat = X.reshape(-1, N_FEATURES)  # view for contiguous arrays
+    flat *= scaler.scale_
+    flat += scaler.min_
+    return X
+
+
+def _save_trained(model, scaler):
+    os.makedirs("models", exist_ok=True)
+    model.save(MODEL_PATH)
+    pickle.dump(scaler, open(SCALER_PATH, "wb"))
+    registry.reload("lstm")
+    # Keep an existing NumPy export in step with the new weights
+    if os.path.exists(NUMPY_MODEL_PATH):
+        export_numpy_lstm()
+
+
 def train_lstm_model():
     """Train LSTM model on weather data"""
     print("🔄 Preparing training data...")
@@ -65,9 +86,8 @@ def train_lstm_model():
     
     # Normalize features
     scaler = MinMaxScaler()
-    X_train_scaled = X_train.reshape(-1, 4)
-    X_train_scaled = scaler.fit_transform(X_train_scaled)
-    X_train_scaled = X_train_scaled.reshape(-1, 7, 4)
+    scaler.fit(X_train.reshape(-1, N_FEATURES))
+    X_train_scaled = _scale_in_place(X_train, scaler)
     
     print("🔄 Building LSTM model...")
     model = create_lstm_model()
@@ -76,13 +96,288 @@ def train_lstm_model():
     model.fit(X_train_scaled, y_train, epochs=50, batch_size=32, validation_split=0.2, verbose=1)
     
     # Save model and scaler
-    os.makedirs("models", exist_ok=True)
-    model.save(MODEL_PATH)
-    pickle.dump(scaler, open(SCALER_PATH, "wb"))
+    _save_trained(model, scaler)
     
     print("✅ LSTM model trained and saved!")
     return model
 
+
+# ---------------------------------------------------------------------------
+# Sliding-window training on real weather time series
+# ---------------------------------------------------------------------------
+
+FEATURE_COLUMNS = ["temp", "humidity", "wind", "pressure"]
+WINDOW_CHUNK = 1024  # windows handed to tf.data per generator step
+
+
+def sliding_windows(values, window=SEQ_LEN):
+    """Zero-copy (n_windows, window, features) strided view over (days, features)."""
+    return np.lib.stride_tricks.sliding_window_view(values, window, axis=0).transpose(0, 2, 1)
+
+
+def window_labels(daily_labels, window=SEQ_LEN, horizon=1):
+    """Label per window: highest risk class in the `horizon` days after it ends."""
+    daily = np.asarray(daily_labels, dtype=np.int8)
+    n_windows = len(daily) - window + 1
+    future = np.concatenate([daily[window:], np.zeros(horizon, dtype=np.int8)])
+    return np.lib.stride_tricks.sliding_window_view(future, horizon).max(axis=1)[:n_windows]
+
+
+def events_from_emdat(df):
+    """Disaster dates and risk classes from EM-DAT style rows.
+    
+    Uses Start Year/Month/Day (missing month/day -> 1) and maps Total Deaths to
+    a class with the same cut-offs as prediction.training_features. Unlike
+    there, a missing death count is LOW: these labels mark risky days in a
+    weather series, and an event with no recorded deaths is no evidence of
+    a critical one.
+    """
+    dates = pd.to_datetime(pd.DataFrame({
+        "year": df["Start Year"],
+        "month": df.get("Start Month", pd.Series(1, index=df.index)).fillna(1),
+        "day": df.get("Start Day", pd.Series(1, index=df.index)).fillna(1),
+    }), errors="coerce")
+    deaths = pd.to_numeric(df.get("Total Deaths", pd.Series(0, index=df.index)), errors="coerce")
+    risk = death_risk_class(deaths.to_numpy(dtype=float), missing=0)
+    return pd.Series(risk, index=dates).loc[lambda s: s.index.notna()]
+
+
+def build_city_arrays(series, events, horizon=1):
+    """Daily feature array and per-window labels for one location.
+    
+    Args:
+        series: DataFrame indexed by date with FEATURE_COLUMNS
+        events: Series of risk classes indexed by disaster date
+    
+    Returns:
+        (values, labels): float32 (days, 4) array and int8 (days - 6,) labels
+    """
+    series = series[FEATURE_COLUMNS].sort_index()
+    series = series[~series.index.duplicated()].asfreq("D").interpolate(limit_direction="both")
+    values = np.ascontiguousarray(series.to_numpy(dtype=np.float32))
+    daily = events.groupby(events.index.normalize()).max().reindex(series.index, fill_value=0)
+    return values, window_labels(daily.to_numpy(), horizon=horizon)
+
+
+def make_window_dataset(city_arrays, batch_size=64, shuffle_buffer=10_000, seed=42):
+    """tf.data pipeline cutting windows lazily from each city's daily array.
+    
+    Cities are interleaved in parallel; windows are strided views copied one
+    chunk at a time, so the full set of windows never sits in RAM.
+    """
+    import tensorflow as tf
+    
+    def city_chunks(i):
+        values, labels = city_arrays[int(i)]
+        windows = sliding_windows(values)
+        for lo in range(0, len(windows), WINDOW_CHUNK):
+            hi = lo + WINDOW_CHUNK
+            yield windows[lo:hi], np.eye(4, dtype=np.float32)[labels[lo:hi]]
+    
+    signature = (tf.TensorSpec((None, SEQ_LEN, N_FEATURES), tf.float32),
+                 tf.TensorSpec((None, 4), tf.float32))
+    per_city = lambda i: tf.data.Dataset.from_generator(
+        city_chunks, args=(i,), output_signature=signature).unbatch()
+    
+    n = len(city_arrays)
+    return (tf.data.Dataset.range(n)
+            .shuffle(n, seed=seed)
+            .interleave(per_city, cycle_length=min(n, 8), num_parallel_calls=tf.data.AUTOTUNE,
+                        deterministic=False)
+            .shuffle(shuffle_buffer, seed=seed)
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def train_lstm_on_series(city_data, epochs=20, batch_size=64, horizon=1):
+    """Train the LSTM on real multi-city weather history.
+    
+    Args:
+        city_data: iterable of (series, events) per location, see build_city_arrays
+        horizon: days after a window in which a disaster makes it positive
+    """
+    print("🔄 Building daily arrays...")
+    city_arrays = [build_city_arrays(series, events, horizon) for series, events in city_data]
+    city_arrays = [(v, l) for v, l in city_arrays if len(v) >= SEQ_LEN]
+    if not city_arrays:
+        raise ValueError("No location has at least 7 days of weather data")
+    
+    # Fit the scaler on daily rows, then scale each series once in place;
+    # windows are views into the scaled arrays
+    scaler = MinMaxScaler()
+    for values, _ in city_arrays:
+        scaler.partial_fit(values)
+    for values, _ in city_arrays:
+        _scale_in_place(values, scaler)
+    
+    n_windows = sum(len(l) for _, l in city_arrays)
+    print(f"🔄 Training on {n_windows:,} windows from {len(city_arrays)} locations...")
+    model = create_lstm_model()
+    model.fit(make_window_dataset(city_arrays, batch_size=batch_size), epochs=epochs, verbose=1)
+    
+    _save_trained(model, scaler)
+    print("✅ LSTM model trained and saved!")
+    return model
+
+def _load_keras(paths):
+    if MODEL_PATH not in paths or SCALER_PATH not in paths:
+        raise FileNotFoundError(MODEL_PATH if MODEL_PATH not in paths else SCALER_PATH)
+    from tensorflow.keras.models import load_model
+    scaler = pickle.load(open(SCALER_PATH, "rb"))
+    return load_model(MODEL_PATH), scaler
+
+
+def _load_numpy(paths):
+    if not paths:
+        raise FileNotFoundError(NUMPY_MODEL_PATH)
+    return NumpyLSTM.load(paths[0])
+
+
+registry.register("lstm", [MODEL_PATH, SCALER_PATH], _load_keras)
+registry.register("lstm_numpy", [NUMPY_MODEL_PATH], _load_numpy)
+
+
+def load_lstm_model():
+    """Keras model and scaler, loaded once and kept resident by the registry."""
+    if not os.path.exists(MODEL_PATH):
+        print("⚠ Model not found, training new model...")
+        train_lstm_model()
+    return registry.get("lstm") or (None, None)
+
+
+def export_numpy_lstm(out_path=NUMPY_MODEL_PATH):
+    """Export LSTM, dense and scaler weights to .npz for `NumpyLSTM`."""
+    model, scaler = load_lstm_model()
+    weights = {"scale": scaler.scale_.astype(np.float32), "offset": scaler.min_.astype(np.float32)}
+    lstm_i = dense_i = 0
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "LSTM":
+            kernel, recurrent, bias = layer.get_weights()
+            weights[f"lstm{lstm_i}_kernel"] = kernel
+            weights[f"lstm{lstm_i}_recurrent"] = recurrent
+            weights[f"lstm{lstm_i}_bias"] = bias
+            lstm_i += 1
+        elif kind == "Dense":
+            kernel, bias = layer.get_weights()
+            weights[f"dense{dense_i}_kernel"] = kernel
+            weights[f"dense{dense_i}_bias"] = bias
+            dense_i += 1
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    np.savez(out_path, **weights)
+    if out_path == NUMPY_MODEL_PATH:
+        registry.reload("lstm_numpy")
+    print(f"✅ Exported NumPy LSTM weights to {out_path}")
+    return NumpyLSTM(weights)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyLSTM:
+    """Pure-NumPy forward pass of the 2-layer LSTM + dense head (inference only).
+    
+    Gate layout follows Keras: [input, forget, cell, output], tanh activation,
+    sigmoid recurrent activation. Dropout is a no-op at inference.
+    """
+    
+    def __init__(self, weights):
+        self.w = {k: np.asarray(v, dtype=np.float32) for k, v in weights.items()}
+    
+    @classmethod
+    def load(cls, path=NUMPY_MODEL_PATH):
+        with np.load(path) as data:
+            return cls({k: data[k] for k in data.files})
+    
+    def _lstm(self, x, i, return_sequences):
+        kernel = self.w[f"lstm{i}_kernel"]
+        recurrent = self.w[f"lstm{i}_recurrent"]
+        bias = self.w[f"lstm{i}_bias"]
+        units = recurrent.shape[0]
+        batch, steps, _ = x.shape
+        # Input projections for all timesteps in one matmul
+        xw = x @ kernel + bias
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        outputs = []
+        for t in range(steps):
+            z = xw[:, t] + h @ recurrent
+            gate_i = _sigmoid(z[:, :units])
+            gate_f = _sigmoid(z[:, units:2 * units])
+            cand = np.tanh(z[:, 2 * units:3 * units])
+            gate_o = _sigmoid(z[:, 3 * units:])
+            c = gate_f * c + gate_i * cand
+            h = gate_o * np.tanh(c)
+            if return_sequences:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if return_sequences else h
+    
+    def resident_bytes(self):
+        return sum(w.nbytes for w in self.w.values())
+    
+    def predict(self, X):
+        """Class probabilities (batch, 4) for raw (unscaled) sequences."""
+        x = np.asarray(X, dtype=np.float32).reshape(-1, SEQ_LEN, N_FEATURES)
+        x = x * self.w["scale"] + self.w["offset"]
+        x = self._lstm(x, 0, return_sequences=True)
+        x = self._lstm(x, 1, return_sequences=False)
+        x = np.maximum(x @ self.w["dense0_kernel"] + self.w["dense0_bias"], 0)
+        logits = x @ self.w["dense1_kernel"] + self.w["dense1_bias"]
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+
+def load_numpy_lstm():
+    """NumPy model from the exported weights (exported on first use if missing)."""
+    if not os.path.exists(NUMPY_MODEL_PATH):
+        export_numpy_lstm()
+    return registry.get("lstm_numpy")
+
+
+def predict_proba_lstm(sequences, backend=None):
+    """Class probabilities (batch, 4) for a batch of 7x4 weather sequences."""
+    X = np.asarray(sequences, dtype=np.float32).reshape(-1, SEQ_LEN, N_FEATURES)
+    if (backend or LSTM_BACKEND) == "numpy":
+        return load_numpy_lstm().predict(X)
+    model, scaler = load_lstm_model()
+    X_scaled = scaler.transform(X.reshape(-1, N_FEATURES)).reshape(X.shape)
+    return model.predict(X_scaled, verbose=0)
+
+
+def _format_prediction(prediction):
+    risk_class = int(np.argmax(prediction))
+    confidence = float(prediction[risk_class])
+    return {
+        "risk": RISK_LEVELS[risk_class],
+        "color": COLORS[risk_class],
+        "emoji": EMOJIS[risk_class],
+        "confidence": round(confidence, 2),
+        "probabilities": {
+            level: round(float(p), 2) for level, p in zip(RISK_LEVELS, prediction)
+        },
+        "model": "LSTM Neural Network"
+    }
+
+
+def predict_with_lstm_batch(weather_sequences, backend=None):
+    """
+    Predict disaster risk for many 7-day sequences in one model call
+    
+    Args:
+        weather_sequences: array-like of shape (batch, 7, 4)
+        backend: "keras" or "numpy" (defaults to LSTM_BACKEND)
+    
+    Returns:
+        list: one result dict per sequence, or None on error
+    """
+    try:
+        return [_format_prediction(p) for p in predict_proba_lstm(weather_sequences, backend)]
+    except Exception as e:
+        print(f"Error in LSTM prediction: {e}")
+        return None
+
+
 def predict_with_lstm(weather_sequence):
     """
     Predict disaster risk using LSTM
@@ -94,49 +389,13 @@ def predict_with_lstm(weather_sequence):
     Returns:
         dict: {risk, confidence, probabilities}
     """
-    try:
-        # Load model and scaler
-        if not os.path.exists(MODEL_PATH):
-            print("⚠ Model not found, training new model...")
-            train_lstm_model()
-        
-        model = load_model(MODEL_PATH)
-        scaler = pickle.load(open(SCALER_PATH, "rb"))
-        
-        # Prepare input
-        X = np.array(weather_sequence).reshape(1, 7, 4)
-        X_scaled = scaler.transform(X.reshape(-1, 4)).reshape(1, 7, 4)
-        
-        # Predict
-        prediction = model.predict(X_scaled, verbose=0)[0]
-        risk_class = np.argmax(prediction)
-        confidence = float(prediction[risk_class])
-        
-        risk_levels = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
-        colors = ['#4CAF50', '#FFC107', '#FF9800', '#F44336']
-        emojis = ['✅', '⚠', '⚠⚠', '🚨']
-        
-        return {
-            "risk": risk_levels[risk_class],
-            "color": colors[risk_class],
-            "emoji": emojis[risk_class],
-            "confidence": round(confidence, 2),
-            "probabilities": {
-                "LOW": round(float(prediction[0]), 2),
-                "MEDIUM": round(float(prediction[1]), 2),
-                "HIGH": round(float(prediction[2]), 2),
-                "CRITICAL": round(float(prediction[3]), 2)
-            },
-            "model": "LSTM Neural Network"
-        }
-    
-    except Exception as e:
-        print(f"Error in LSTM prediction: {e}")
-        return None
+    results = predict_with_lstm_batch([weather_sequence])
+    return results[0] if results else None
 
 if __name__ == "__main__":
     # Train model
     train_lstm_model()
+    export_numpy_lstm()
     
     # Test prediction
     test_weather = [
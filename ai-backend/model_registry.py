@@ -0,0 +1,193 @@
+"""
+Central registry for model and knowledge-base artifacts.
+Each artifact is loaded lazily on first use, tagged with a version and
+checksum, and swapped atomically when its files change on disk.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 5))
+
+
+def _checksum(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def resident_bytes(obj):
+    """Best-effort in-memory size of a loaded artifact."""
+    if hasattr(obj, "resident_bytes"):
+        return obj.resident_bytes()
+    if hasattr(obj, "memory_usage"):  # pandas DataFrame
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sum(resident_bytes(o) for o in obj)
+    if hasattr(obj, "count_params"):  # Keras model, float32 weights
+        return int(obj.count_params()) * 4
+    if hasattr(obj, "save_raw"):  # xgboost Booster
+        return len(obj.save_raw())
+    return sys.getsizeof(obj)
+
+
+class Artifact:
+    """One registered artifact: its files, loader and current loaded value."""
+
+    def __init__(self, name, paths, loader):
+        self.name = name
+        self.paths = list(paths)
+        self.loader = loader
+        self.value = None
+        self.loaded = False
+        self.version = 0
+        self.checksum = None
+        self.mtimes = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.size_bytes = None
+        self.error = None
+
+    def existing_paths(self):
+        return [p for p in self.paths if os.path.exists(p)]
+
+    def current_mtimes(self):
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in self.paths)
+
+    def info(self):
+        return {
+            "name": self.name,
+            "loaded": self.loaded,
+            "version": self.version,
+            "checksum": self.checksum,
+            "files": self.existing_paths(),
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "loaded_at": self.loaded_at,
+            "resident_bytes": self.size_bytes,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """Lazy, versioned, hot-reloadable artifact store.
+
+    `get()` never blocks on a reload of an already loaded artifact: the
+    watcher (or `reload()`) builds the new value first and then replaces
+    the reference, so in-flight requests keep using the old one.
+    """
+
+    def __init__(self):
+        self._artifacts = {}
+        self._locks = {}
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def register(self, name, paths, loader):
+        """Register `loader(existing_paths) -> value` for files in `paths`."""
+        if name not in self._artifacts:
+            self._artifacts[name] = Artifact(name, paths, loader)
+            self._locks[name] = threading.Lock()
+        return self._artifacts[name]
+
+    def get(self, name):
+        """Loaded value of `name`, loading it on first use (None if unavailable)."""
+        artifact = self._artifacts[name]
+        if not artifact.loaded:
+            with self._locks[name]:
+                if not artifact.loaded:
+                    self._load(artifact)
+        return artifact.value
+
+    def reload(self, name, force=False):
+        """Reload `name` if its files changed (or always with `force`)."""
+        artifact = self._artifacts[name]
+        with self._locks[name]:
+            if force or not artifact.loaded or artifact.current_mtimes() != artifact.mtimes:
+                return self._load(artifact)
+        return False
+
+    def _load(self, artifact):
+        mtimes = artifact.current_mtimes()
+        paths = artifact.existing_paths()
+        try:
+            checksum = _checksum(paths) if paths else None
+            if artifact.loaded and checksum == artifact.checksum:
+                artifact.mtimes = mtimes  # touched but identical
+                artifact.error = None
+                return False
+            start = time.perf_counter()
+            value = artifact.loader(paths)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            artifact.error = str(e)
+            artifact.mtimes = mtimes
+            print(f"[WARNING] Could not load artifact '{artifact.name}': {e}")
+            if not artifact.loaded:
+                artifact.loaded = True  # don't retry on every request; watcher retries
+            return False
+
+        # Atomic swap: readers see either the old or the new value
+        artifact.value = value
+        artifact.loaded = True
+        artifact.version += 1
+        artifact.checksum = checksum
+        artifact.mtimes = mtimes
+        artifact.load_seconds = elapsed
+        artifact.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        artifact.size_bytes = resident_bytes(value) if value is not None else None
+        artifact.error = None
+        if artifact.version > 1:
+            print(f"[OK] Reloaded '{artifact.name}' (version {artifact.version}, {checksum})")
+        return True
+
+    def version(self, name):
+        return self._artifacts[name].version
+
+    def error(self, name):
+        """Message from the last failed load of `name` (None if it loaded)."""
+        return self._artifacts[name].error
+
+    def check_for_updates(self, skip=()):
+        """Reload every loaded artifact whose files changed (except `skip`)."""
+        for name, artifact in list(self._artifacts.items()):
+            if name not in skip and artifact.loaded and artifact.current_mtimes() != artifact.mtimes:
+                self.reload(name)
+
+    def start_watcher(self, interval=WATCH_INTERVAL, skip=()):
+        """Poll artifact files in the background and hot-swap new versions.
+
+        Artifacts named in `skip` are reloaded by someone else (serve.py's
+        master for the shared knowledge base).
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.check_for_updates(skip)
+                except Exception as e:
+                    print(f"[WARNING] Model watcher error: {e}")
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def info(self):
+        return [a.info() for a in self._artifacts.values()]
+
+
+registry = ModelRegistry()
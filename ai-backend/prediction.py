@@ -2,13 +2,17 @@
 Simple ML-based disaster prediction model.
 Uses location, temperature, humidity, wind to predict disaster risk.
 """
-import pickle
 import os
+import joblib
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 import numpy as np
+from risk_rules import HEURISTIC_KERNEL, death_risk_class
 
-MODEL_PATH = "models/disaster_predictor.pkl"
+MODEL_PATH = "models/disaster_predictor.joblib"
+N_ESTIMATORS = int(os.getenv("PREDICTOR_TREES", 10))
+# zlib level for the saved forest: small file, fast load
+MODEL_COMPRESS = ("zlib", 3)
 SCALER_PATH = "models/disaster_scaler.pkl"
 
 # Risk levels mapping
@@ -20,43 +24,42 @@ RISK_LEVELS = {
 }
 
 
-def train_prediction_model(df):
-    """Train disaster prediction model from disaster dataset."""
+def training_features(df):
+    """Feature matrix and labels for the prediction model, built column-wise.
+
+    Features: location_encoded, start year, death count. Labels follow the
+    death-count ladder 0=LOW (<20), 1=MEDIUM (<60), 2=HIGH (<100),
+    3=CRITICAL (risk_rules.death_risk_class); a missing death count falls
+    through to CRITICAL, as in the original if/elif labelling.
+    """
+    n = len(df)
+
+    def column(name, default):
+        if name in df.columns:
+            return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+        return np.full(n, default, dtype=np.float64)
+
+    deaths = column("Total Deaths", 0)
+    X = np.column_stack([column("location_encoded", 0), column("Start Year", 2000), deaths])
+    y = death_risk_class(deaths, missing=3)
+    return X, y
+
+
+def train_prediction_model(df, n_estimators=N_ESTIMATORS, n_jobs=-1):
+    """Train disaster prediction model from disaster dataset.
+
+    Args:
+        df: knowledge-base records
+        n_estimators: number of trees (PREDICTOR_TREES env var by default)
+        n_jobs: cores used for fitting, -1 for all
+    """
     try:
-        # Features: extract weather-like patterns from disaster data
-        # For demo: we'll use location + year-based trend
-        
-        X = []
-        y = []
-        
-        for idx, row in df.iterrows():
-            # Mock features (in production: use actual weather data)
-            # Feature 1: location_encoded, Feature 2: start_year trend, Feature 3: death count indicator
-            location_encoded = row.get("location_encoded", 0)
-            year = row.get("Start Year", 2000)
-            deaths = row.get("Total Deaths", 0)
-            
-            X.append([location_encoded, year, deaths])
-            # Risk: 0=LOW, 1=MEDIUM, 2=HIGH, 3=CRITICAL
-            # Simple heuristic: higher deaths = higher risk
-            if deaths < 20:
-                y.append(0)
-            elif deaths < 60:
-                y.append(1)
-            elif deaths < 100:
-                y.append(2)
-            else:
-                y.append(3)
-        
-        X = np.array(X)
-        y = np.array(y)
-        
-        # Train classifier
-        model = RandomForestClassifier(n_estimators=10, random_state=42, max_depth=5)
+        X, y = training_features(df)
+        model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, max_depth=5, n_jobs=n_jobs)
         model.fit(X, y)
-        
+
         os.makedirs("models", exist_ok=True)
-        pickle.dump(model, open(MODEL_PATH, "wb"))
+        joblib.dump(model, MODEL_PATH, compress=MODEL_COMPRESS)
         return model
     except Exception as e:
         print(f"Error training model: {e}")
@@ -64,10 +67,10 @@ def train_prediction_model(df):
 
 
 def load_prediction_model():
-    """Load trained model from disk."""
+    """Load the model trained by etl.py's predictor stage (None if missing)."""
     try:
         if os.path.exists(MODEL_PATH):
-            return pickle.load(open(MODEL_PATH, "rb"))
+            return joblib.load(MODEL_PATH)
     except Exception as e:
         print(f"Error loading model: {e}")
     return None
@@ -77,7 +80,7 @@ def predict_disaster_risk(location_encoded: int, temp: float, humidity: int, win
     """Predict disaster risk based on weather and location.
     
     Args:
-        location_encoded: encoded location ID
+        location_encoded: encoded location ID (None if the location is unknown)
         temp: temperature in Celsius
         humidity: humidity percentage
         wind: wind speed m/s
@@ -95,57 +98,45 @@ def predict_disaster_risk(location_encoded: int, temp: float, humidity: int, win
 
 
 def predict_heuristic(temp: float, humidity: int, wind: float) -> dict:
-    """Simple heuristic prediction when ML model unavailable."""
-    risk_score = 0
-    
-    # Temperature risk (extreme temps increase disaster risk)
-    if temp < 0 or temp > 45:
-        risk_score += 3
-    elif temp < 5 or temp > 40:
-        risk_score += 2
-    elif temp < 10 or temp > 35:
-        risk_score += 1
-    
-    # Humidity risk (very high humidity = flood risk)
-    if humidity > 90:
-        risk_score += 3
-    elif humidity > 80:
-        risk_score += 2
-    elif humidity > 70:
-        risk_score += 1
-    
-    # Wind risk (high wind = storm/cyclone risk)
-    if wind > 20:
-        risk_score += 3
-    elif wind > 15:
-        risk_score += 2
-    elif wind > 10:
-        risk_score += 1
-    
-    # Map score to risk level
-    if risk_score >= 6:
-        risk_class = 3  # CRITICAL
-    elif risk_score >= 4:
-        risk_class = 2  # HIGH
-    elif risk_score >= 2:
-        risk_class = 1  # MEDIUM
-    else:
-        risk_class = 0  # LOW
+    """Simple heuristic prediction when ML model unavailable.
     
+    Thresholds live in `risk_rules.FEATURE_RULES` and are shared with the
+    XGBoost training labels.
+    """
+    risk_class = int(HEURISTIC_KERNEL.classify(temp=[temp], humidity=[humidity], wind=[wind])[0])
+    return _risk_response(risk_class)
+
+
+RECOMMENDATIONS = {
+    "LOW": "No immediate threat. Stay informed about weather updates.",
+    "MEDIUM": "Moderate risk. Review disaster preparedness checklist.",
+    "HIGH": "High risk! Prepare emergency kit and know evacuation routes.",
+    "CRITICAL": "🚨 CRITICAL ALERT! Follow local authorities and evacuate if instructed."
+}
+
+
+def _risk_response(risk_class: int) -> dict:
+    """Build the API response for a risk class."""
     risk_info = RISK_LEVELS[risk_class]
-    
-    recommendations = {
-        "LOW": "No immediate threat. Stay informed about weather updates.",
-        "MEDIUM": "Moderate risk. Review disaster preparedness checklist.",
-        "HIGH": "High risk! Prepare emergency kit and know evacuation routes.",
-        "CRITICAL": "🚨 CRITICAL ALERT! Follow local authorities and evacuate if instructed."
-    }
-    
     return {
         "risk": risk_info["level"],
         "color": risk_info["color"],
         "emoji": risk_info["emoji"],
         "confidence": 0.75,
-        "recommendation": recommendations.get(risk_info["level"], "Unknown risk"),
+        "recommendation": RECOMMENDATIONS.get(risk_info["level"], "Unknown risk"),
         "risk_class": int(risk_class)
     }
+
+
+def score_heuristic_batch(temps, humidities, winds) -> np.ndarray:
+    """Vectorized `predict_heuristic`: risk classes for whole arrays at once."""
+    return HEURISTIC_KERNEL.classify(temp=temps, humidity=humidities, wind=winds)
+
+
+def predict_disaster_risk_batch(locations_encoded, temps, humidities, winds) -> list:
+    """Batch version of `predict_disaster_risk`, scoring all rows in one NumPy pass.
+    
+    Returns one response dict per input row, in input order.
+    """
+    classes = score_heuristic_batch(temps, humidities, winds)
+    return [_risk_response(int(c)) for c in classes]
@@ -0,0 +1,85 @@
+"""
+Weather risk rules declared as data.
+Each feature lists (threshold, score) steps; they are compiled once into
+bin edges plus score lookup tables and evaluated with np.digitize, so the
+same rules score one reading or millions of rows.
+"""
+import numpy as np
+
+# "above": score applies when value > threshold (highest matching step wins)
+# "below": score applies when value < threshold (lowest matching step wins)
+FEATURE_RULES = {
+    # Temperature extremes
+    "temp": {"below": [(0, 3), (5, 2), (10, 1)], "above": [(35, 1), (40, 2), (45, 3)]},
+    # Humidity (flood risk)
+    "humidity": {"above": [(70, 1), (80, 2), (90, 3)]},
+    # Wind (cyclone/storm risk)
+    "wind": {"above": [(10, 1), (15, 2), (20, 3)]},
+    # Rainfall (flood risk)
+    "rainfall": {"above": [(20, 1), (50, 2), (100, 3)]},
+    # Pressure (storm risk)
+    "pressure": {"below": [(990, 2), (1000, 1)]},
+}
+
+# Total score >= edge[i] -> risk class i + 1 (0=LOW ... 3=CRITICAL)
+HEURISTIC_CLASS_EDGES = [2, 4, 6]
+TRAINING_CLASS_EDGES = [2, 5, 8]
+
+# Historical events: total deaths >= edge[i] -> risk class i + 1
+DEATH_CLASS_EDGES = [20, 60, 100]
+
+
+def _compile_side(steps, side):
+    """Turn (threshold, score) steps into (edges, lookup table) for np.digitize."""
+    steps = sorted(steps)
+    edges = np.array([t for t, _ in steps], dtype=float)
+    scores = [s for _, s in steps]
+    if side == "above":
+        # digitize(right=True): index i means edges[i-1] < x <= edges[i]
+        table = [0] + scores
+    else:
+        # digitize(right=False): index i means edges[i-1] <= x < edges[i]
+        table = scores + [0]
+    return edges, np.array(table, dtype=np.int64)
+
+
+def death_risk_class(deaths, missing):
+    """Risk class per death count (DEATH_CLASS_EDGES); `missing` for NaN counts."""
+    deaths = np.asarray(deaths, dtype=float)
+    classes = np.digitize(np.nan_to_num(deaths), DEATH_CLASS_EDGES)
+    return np.where(np.isnan(deaths), missing, classes)
+
+
+class RiskKernel:
+    """Vectorized scorer compiled from a subset of FEATURE_RULES."""
+
+    def __init__(self, features, class_edges, rules=FEATURE_RULES):
+        self.features = list(features)
+        self.class_edges = np.array(class_edges, dtype=float)
+        self.compiled = {
+            name: {side: _compile_side(steps, side) for side, steps in rules[name].items()}
+            for name in self.features
+        }
+
+    def score(self, **columns) -> np.ndarray:
+        """Total risk score per row; every feature of the kernel is required."""
+        total = None
+        for name in self.features:
+            x = np.asarray(columns[name], dtype=float)
+            feature_score = np.zeros(x.shape, dtype=np.int64)
+            for side, (edges, table) in self.compiled[name].items():
+                idx = np.digitize(x, edges, right=(side == "above"))
+                np.maximum(feature_score, table[idx], out=feature_score)
+            # digitize puts NaN in the top bin; like a failed comparison it scores 0
+            feature_score[np.isnan(x)] = 0
+            total = feature_score if total is None else total + feature_score
+        return total
+
+    def classify(self, **columns) -> np.ndarray:
+        """Risk class per row (0=LOW, 1=MEDIUM, 2=HIGH, 3=CRITICAL)."""
+        return np.digitize(self.score(**columns), self.class_edges, right=False)
+
+
+# Live prediction uses the weather the API gets; training labels use all five features
+HEURISTIC_KERNEL = RiskKernel(["temp", "humidity", "wind"], HEURISTIC_CLASS_EDGES)
+TRAINING_KERNEL = RiskKernel(["temp", "humidity", "wind", "pressure", "rainfall"], TRAINING_CLASS_EDGES)
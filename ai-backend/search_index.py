@@ -0,0 +1,179 @@
+"""
+In-memory inverted index for full-text search over disaster records.
+Free-text columns are tokenized once at knowledge-base load into CSR
+postings (term -> sorted row positions) with precomputed BM25 term
+weights, so a query only touches the postings of its own terms.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+SEARCH_COLUMNS = ["Event Name", "Location", "Associated Types", "Disaster Subtype", "Disaster Type"]
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# A query token also matches up to this many vocabulary terms it prefixes
+PREFIX_EXPANSION = 50
+# Score weight of a prefix expansion relative to an exact term match
+PREFIX_WEIGHT = 0.5
+
+
+def _fold(text):
+    """Lowercase and strip accents so "Orissa"/"orissa" and "Bengale"/"Bengalé" match."""
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(_fold(text)) if text else []
+
+
+class SearchIndex:
+    """BM25 inverted index over the text columns of a DataFrame.
+
+    Postings are stored CSR-style: `terms[i]`'s rows are
+    `docs[offsets[i]:offsets[i + 1]]` with matching BM25 tf weights in
+    `weights`; `idf[i]` is the term's inverse document frequency.
+    """
+
+    def __init__(self, terms, offsets, docs, weights, idf, n_docs):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.idf = idf
+        self.n_docs = n_docs
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+
+    @classmethod
+    def build(cls, df, columns=SEARCH_COLUMNS):
+        columns = [c for c in columns if df is not None and c in df.columns]
+        if not columns or df.empty:
+            return cls([], np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                       np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32), 0)
+        n = len(df)
+        text = pd.Series([""] * n, dtype=object)
+        for col in columns:
+            values = pd.Series(df[col].to_numpy(dtype=object)).fillna("").astype(str)
+            text = text + " " + values
+        tokens = text.map(tokenize).explode().dropna()
+
+        doc_of_token = tokens.index.to_numpy(dtype=np.int64)
+        codes, vocab = pd.factorize(tokens.to_numpy(dtype=object))
+        # Sorted vocabulary so prefixes map to a contiguous term range
+        order = np.argsort(vocab.astype(str))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        term_of_token = rank[codes]
+        terms = [str(vocab[i]) for i in order]
+
+        # (term, doc) pairs sorted by term then doc, with term frequencies
+        pairs, tf = np.unique(term_of_token * n + doc_of_token, return_counts=True)
+        term_ids, docs = pairs // n, pairs % n
+        offsets = np.searchsorted(term_ids, np.arange(len(terms) + 1)).astype(np.int64)
+
+        doc_len = np.bincount(doc_of_token, minlength=n).astype(np.float32)
+        avg_len = float(doc_len.mean()) or 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / avg_len)
+        weights = (tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+        df_counts = np.diff(offsets)
+        idf = np.log1p((n - df_counts + 0.5) / (df_counts + 0.5)).astype(np.float32)
+        return cls(terms, offsets, docs.astype(np.int32), weights, idf, n)
+
+    def __len__(self):
+        return self.n_docs
+
+    def _expand(self, token, prefix):
+        """Term ids matched by `token` with their score weights."""
+        matches = []
+        exact = self.term_ids.get(token)
+        if exact is not None:
+            matches.append((exact, 1.0))
+        if prefix:
+            i = bisect_left(self.terms, token)
+            while i < len(self.terms) and len(matches) < PREFIX_EXPANSION and self.terms[i].startswith(token):
+                if i != exact:
+                    matches.append((i, PREFIX_WEIGHT))
+                i += 1
+        return matches
+
+    def search(self, query, prefix=True, match_all=True, offset=0, limit=None):
+        """Rank rows for `query` and return one page of hits.
+
+        Args:
+            prefix: let query tokens match longer terms ("cyclo" -> "cyclone")
+            match_all: only return rows matching every query token
+            offset, limit: page of the ranking to return (limit None = all)
+
+        Returns (row positions, scores, total hits), best score first.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), 0
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.n_docs:
+            return empty
+        postings = [(t, term, weight) for t, token in enumerate(tokens)
+                    for term, weight in self._expand(token, prefix)]
+        if not postings:
+            return empty
+        size = sum(int(self.offsets[term + 1] - self.offsets[term]) for _, term, _ in postings)
+
+        # Few postings: work on them only; many: dense per-row accumulators
+        if size * 8 < self.n_docs:
+            rows, scores, matched = self._score_sparse(postings, len(tokens))
+        else:
+            rows, scores, matched = self._score_dense(postings, len(tokens))
+        if match_all and len(tokens) > 1:
+            keep = matched == len(tokens)
+            rows, scores = rows[keep], scores[keep]
+
+        total = len(rows)
+        stop = total if limit is None else min(total, offset + limit)
+        if stop < total:
+            # Only the requested page needs a full sort; keep every row tied
+            # with the cutoff so (score, row) order matches the full ranking
+            cutoff = -np.partition(-scores, stop - 1)[stop - 1]
+            top = scores >= cutoff
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((rows, -scores))[offset:stop]
+        return rows[order].astype(np.int64), scores[order], total
+
+    def _postings(self, term):
+        lo, hi = self.offsets[term], self.offsets[term + 1]
+        return self.docs[lo:hi], self.weights[lo:hi] * self.idf[term]
+
+    def _score_sparse(self, postings, n_tokens):
+        doc_parts, score_parts, token_parts = [], [], []
+        for t, term, weight in postings:
+            docs, scores = self._postings(term)
+            doc_parts.append(docs)
+            score_parts.append(scores * weight)
+            token_parts.append(np.full(len(docs), t, dtype=np.int64))
+        rows, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype(np.float32)
+        # Distinct query tokens matched per row
+        hit = np.unique(inverse.astype(np.int64) * n_tokens + np.concatenate(token_parts))
+        matched = np.bincount(hit // n_tokens, minlength=len(rows))
+        return rows, scores, matched
+
+    def _score_dense(self, postings, n_tokens):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = np.zeros(self.n_docs, dtype=np.int16)
+        hit = np.zeros(self.n_docs, dtype=bool)
+        for t in range(n_tokens):
+            hit[:] = False
+            for _, term, weight in (p for p in postings if p[0] == t):
+                docs, term_scores = self._postings(term)
+                # A term lists each row once, so plain fancy-index adds are safe
+                scores[docs] += term_scores * weight
+                hit[docs] = True
+            matched += hit
+        rows = np.flatnonzero(matched)
+        return rows, scores[rows], matched[rows]
+
+    def resident_bytes(self):
+        return int(self.offsets.nbytes + self.docs.nbytes + self.weights.nbytes + self.idf.nbytes
+                   + sum(len(t) + 50 for t in self.terms))
@@ -0,0 +1,310 @@
+"""
+Pre-fork production launcher for the Disaster Preparedness API.
+The master publishes the knowledge base once into shared memory
+(kb_shared), attaches to it read-only, builds the indexes and imports the
+app, then forks workers that all accept on one listening socket. Workers
+inherit the read-only mappings and the already built indexes, so adding
+workers adds little memory. The master restarts crashed workers, and when
+the knowledge-base files change it publishes a new generation and replaces
+the workers.
+
+Usage: python serve.py [--workers N] [--host 0.0.0.0] [--port 5000]
+       python serve.py --benchmark [--workers 1,2,4]
+"""
+import argparse
+import gc
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import knowledge_base
+from model_registry import registry
+
+WORKERS = int(os.getenv("WEB_WORKERS", os.cpu_count() or 1))
+# Seconds between checks for crashed workers and changed knowledge-base files
+POLL_INTERVAL = float(os.getenv("SERVE_POLL_INTERVAL", 1))
+SHUTDOWN_TIMEOUT = 10
+
+# Background threads must not exist in the master when it forks;
+# workers start them after the fork instead
+WORKER_THREAD_FLAGS = {"MODEL_WATCH": "1", "WEATHER_PREFETCH": "0"}
+
+
+class Launcher:
+    """Pre-fork master: owns the socket, the shared segments and the workers."""
+
+    def __init__(self, host, port, workers=WORKERS, threaded=True, preload=True):
+        self.host = host
+        self.port = port
+        self.size = workers
+        self.threaded = threaded
+        self.preload = preload
+        self.sock = socket.create_server((host, port), backlog=1024)
+        self.workers = {}  # pid -> generation
+        self.generation = 0
+        self.segments = None
+        self.mtimes = None
+        self.running = True
+        self.flags = {k: os.getenv(k, v) for k, v in WORKER_THREAD_FLAGS.items()}
+
+    def publish(self):
+        """Publish the knowledge base as a new generation and load it here.
+
+        Returns False when the files were only touched (same content): the
+        new segments are dropped and the workers keep the current ones.
+        Raises if the new files cannot be published or loaded; the current
+        generation is then left in place.
+        """
+        old = self.segments
+        segments = knowledge_base.publish_shared()
+        os.environ[knowledge_base.SHARED_MEMORY_ENV] = segments.name
+        gc.unfreeze()
+        try:
+            if old is None:
+                import app  # noqa: F401  preloads the app; its import loads the knowledge base
+            else:
+                version = registry.version("knowledge_base")
+                # Forced: the registry skips files it already failed on, the
+                # master retries them; unchanged content is still detected
+                registry.reload("knowledge_base", force=True)
+                if registry.version("knowledge_base") == version:
+                    error = registry.error("knowledge_base")
+                    if error:
+                        raise RuntimeError(f"could not load the new knowledge base: {error}")
+                    segments.unlink()
+                    os.environ[knowledge_base.SHARED_MEMORY_ENV] = old.name
+                    self.mtimes = segments.meta["meta"]["mtimes"]
+                    return False
+        except BaseException:
+            segments.unlink()
+            if old is not None:
+                os.environ[knowledge_base.SHARED_MEMORY_ENV] = old.name
+            raise
+        finally:
+            gc.collect()
+            # Keep the collector off inherited objects so it doesn't dirty their pages
+            gc.freeze()
+        self.segments = segments
+        self.mtimes = segments.meta["meta"]["mtimes"]
+        self.generation += 1
+        print(f"[OK] Published knowledge base generation {self.generation} "
+              f"to shared memory '{segments.name}'")
+        return True
+
+    def spawn(self, count):
+        # Unflushed output would otherwise be printed again by every child
+        sys.stdout.flush()
+        for _ in range(count):
+            pid = os.fork()
+            if pid == 0:
+                self._serve()
+            self.workers[pid] = self.generation
+
+    def _serve(self):
+        """Worker process body; never returns."""
+        status = 1
+        try:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            os.environ.update(self.flags)
+            from werkzeug.serving import make_server
+            from app import app
+            if self.preload:
+                from weather_prefetch import start_prefetcher
+                if self.flags["MODEL_WATCH"] == "1":
+                    # The master republishes the knowledge base itself
+                    registry.start_watcher(skip=("knowledge_base",))
+                if self.flags["WEATHER_PREFETCH"] == "1":
+                    start_prefetcher()
+
+            server = make_server(self.host, self.port, app, threaded=self.threaded, fd=self.sock.fileno())
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+            print(f"[OK] Worker {os.getpid()} serving on {self.host}:{self.port}", flush=True)
+            server.serve_forever()
+            status = 0
+        except Exception as e:
+            print(f"[WARNING] Worker {os.getpid()} failed: {e}", flush=True)
+        finally:
+            # Skip the master's exit handlers (they own the shared segments)
+            os._exit(status)
+
+    def _reap(self):
+        """Collect exited workers; _top_up replaces those of the current generation."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.workers.pop(pid, None)
+            if generation == self.generation and self.running:
+                print(f"[WARNING] Worker {pid} exited (status {status}), restarting")
+
+    def _top_up(self):
+        """Start workers until the current generation has `size` of them."""
+        current = sum(1 for gen in self.workers.values() if gen == self.generation)
+        self.spawn(self.size - current)
+
+    def _stale(self):
+        return self.preload and knowledge_base.artifact_mtimes() != self.mtimes
+
+    def _roll(self):
+        """New knowledge base: publish it, start new workers, retire the old ones."""
+        print("[INFO] Knowledge base files changed, republishing")
+        old_segments = self.segments
+        if not self.publish():
+            return
+        old = [pid for pid, gen in self.workers.items() if gen != self.generation]
+        try:
+            self.spawn(self.size)
+        finally:
+            # Workers that failed to start are replaced by _top_up on the next poll
+            for pid in old:
+                self._signal(pid, signal.SIGTERM)
+            # Unlinking is safe while old workers still map the segments
+            old_segments.unlink()
+
+    def _signal(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def stop(self, *_):
+        self.running = False
+
+    def run(self):
+        if self.preload:
+            os.environ.update({k: "0" for k in WORKER_THREAD_FLAGS})
+            self.publish()
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        print(f"[OK] Master {os.getpid()} starting {self.size} workers "
+              f"({'shared knowledge base' if self.preload else 'no preload'})", flush=True)
+        self.spawn(self.size)
+        try:
+            while self.running:
+                try:
+                    self._reap()
+                    if self.running:
+                        self._top_up()
+                    if self.running and self._stale():
+                        self._roll()
+                except Exception as e:
+                    # A failed reload or fork must not take down the running workers
+                    print(f"[WARNING] {e}; still serving knowledge base generation "
+                          f"{self.generation}, retrying in {POLL_INTERVAL:.0f}s", flush=True)
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for pid in self.workers:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in self.workers:
+            self._signal(pid, signal.SIGKILL)
+        if self.segments is not None:
+            self.segments.unlink()
+        self.sock.close()
+        print("[OK] Shut down")
+
+
+def _memory_kib(pid):
+    """(PSS, private) of a process in KiB, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def _warm(port, requests_count=400):
+    """Hit knowledge-base endpoints so every worker touches its data."""
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.request import Request, urlopen
+
+    base = f"http://127.0.0.1:{port}"
+    states = json.load(urlopen(base + "/locations"))["locations"]
+
+    def hit(i):
+        kind = i % 4
+        if kind == 0:
+            body = json.dumps({"location": states[i % len(states)]}).encode()
+            req = Request(base + "/get_location_data", body, {"Content-Type": "application/json"})
+        elif kind == 1:
+            req = base + "/search?q=flood"
+        elif kind == 2:
+            req = base + "/stats?group_by=state"
+        else:
+            req = base + "/disasters/nearby?lat=22&lon=80&radius_km=2000"
+        with urlopen(req) as resp:
+            resp.read()
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(hit, range(requests_count)))
+
+
+def benchmark(worker_counts, port=5099):
+    """Total memory of master + workers, shared knowledge base vs. per-worker loading."""
+    print("[INFO] Master + workers after warm-up: PSS (shared pages split between processes) "
+          "and private memory")
+    env = dict(os.environ, MODEL_WATCH="0", WEATHER_PREFETCH="0", PYTHONWARNINGS="ignore")
+    for preload in (False, True):
+        for n in worker_counts:
+            cmd = [sys.executable, os.path.abspath(__file__), "--workers", str(n), "--port", str(port)]
+            if not preload:
+                cmd.append("--no-preload")
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env)
+            pids = []
+            for line in proc.stdout:
+                # Workers share the pipe, so their lines can interleave
+                pids += [int(pid) for pid in re.findall(r"\[OK\] Worker (\d+) serving", line)]
+                if len(pids) >= n:
+                    break
+            # Keep draining so workers never block on a full stdout pipe
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            _warm(port)
+            time.sleep(0.5)
+            memory = [_memory_kib(pid) for pid in [proc.pid] + pids]
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(SHUTDOWN_TIMEOUT + 5)
+            pss = sum(m[0] for m in memory) / 1024
+            private = sum(m[1] for m in memory[1:]) / n / 1024
+            label = "shared knowledge base" if preload else "per-worker loading   "
+            print(f"[INFO] {label} | {n} workers | total PSS {pss:7.1f} MiB | "
+                  f"private per worker {private:6.1f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", default=None,
+                        help="worker processes (comma-separated counts with --benchmark)")
+    parser.add_argument("--no-threads", action="store_true", help="one request at a time per worker")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="each worker loads its own knowledge base (for comparison)")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark([int(n) for n in (args.workers or "1,2,4").split(",")])
+        return
+    Launcher(args.host, args.port, int(args.workers or WORKERS), threaded=not args.no_threads,
+             preload=not args.no_preload).run()
+
+
+if __name__ == "__main__":
+    main()
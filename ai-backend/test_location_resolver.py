@@ -0,0 +1,45 @@
+"""
+Test location resolution against the shipped location encoder
+"""
+import pickle
+import sys
+
+from location_resolver import LocationResolver
+
+ENCODER_PATH = "models/location_encoder.pkl"
+
+print("=" * 50)
+print("LOCATION RESOLVER TEST")
+print("=" * 50)
+
+print("\n[1] Loading shipped encoder...")
+with open(ENCODER_PATH, "rb") as f:
+    encoder = pickle.load(f)
+resolver = LocationResolver(encoder.classes_)
+print(f"✅ {len(resolver.classes)} classes from {ENCODER_PATH}")
+
+failed = False
+
+
+def check(label, got, ok):
+    global failed
+    print(f"{'✅' if ok else '❌'} {label} -> {got!r}")
+    failed |= not ok
+
+
+print("\n[2] City names that are (prefixes of) classes resolve to those classes...")
+mumbai = resolver.resolve("Mumbai")
+check("Mumbai", mumbai, mumbai is not None and mumbai.startswith("Mumbai ("))
+check("Bombay", resolver.resolve("Bombay"), resolver.resolve("Bombay") == "Bombay")
+
+print("\n[3] Aliases apply when their state is an exact class...")
+states = LocationResolver(["Kerala", "Maharashtra", "Tamil Nadu"])
+check("Mumbai (state classes)", states.resolve("Mumbai"), states.resolve("Mumbai") == "Maharashtra")
+check("chennai (state classes)", states.resolve("chennai"), states.resolve("chennai") == "Tamil Nadu")
+
+print("\n" + "=" * 50)
+if failed:
+    print("❌ LOCATION RESOLVER TEST FAILED")
+    sys.exit(1)
+print("✅ ALL TESTS PASSED - location resolution is stable!")
+print("=" * 50)
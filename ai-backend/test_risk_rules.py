@@ -0,0 +1,67 @@
+"""
+Test the compiled risk rules against the original if/elif heuristic
+"""
+import sys
+
+import numpy as np
+
+from prediction import predict_heuristic, score_heuristic_batch
+
+print("=" * 50)
+print("RISK RULES TEST")
+print("=" * 50)
+
+
+def legacy_class(temp, humidity, wind):
+    """The heuristic before the rules became data (NaN compares False everywhere)."""
+    score = 0
+    if temp < 0 or temp > 45:
+        score += 3
+    elif temp < 5 or temp > 40:
+        score += 2
+    elif temp < 10 or temp > 35:
+        score += 1
+    if humidity > 90:
+        score += 3
+    elif humidity > 80:
+        score += 2
+    elif humidity > 70:
+        score += 1
+    if wind > 20:
+        score += 3
+    elif wind > 15:
+        score += 2
+    elif wind > 10:
+        score += 1
+    return 3 if score >= 6 else 2 if score >= 4 else 1 if score >= 2 else 0
+
+
+print("\n[1] Missing readings (NaN) score like the original ladder...")
+nan = float("nan")
+cases = [(nan, nan, nan), (nan, 95, 25), (30, nan, 12), (50, 95, nan), (float("inf"), 50, 5), (-float("inf"), 50, 5)]
+failed = False
+for temp, humidity, wind in cases:
+    got = predict_heuristic(temp, humidity, wind)["risk_class"]
+    expected = legacy_class(temp, humidity, wind)
+    ok = got == expected
+    failed |= not ok
+    print(f"{'✅' if ok else '❌'} temp={temp} humidity={humidity} wind={wind}: class {got} (expected {expected})")
+
+print("\n[2] Batch scoring matches on random readings, thresholds and NaNs...")
+rng = np.random.default_rng(0)
+n = 20000
+temps = rng.choice(np.r_[rng.uniform(-15, 55, 50), [0, 5, 10, 35, 40, 45, nan]], n)
+humidities = rng.choice(np.r_[rng.uniform(0, 100, 50), [70, 80, 90, nan]], n)
+winds = rng.choice(np.r_[rng.uniform(0, 40, 50), [10, 15, 20, nan]], n)
+got = score_heuristic_batch(temps, humidities, winds)
+expected = np.array([legacy_class(*row) for row in zip(temps, humidities, winds)])
+mismatches = int((got != expected).sum())
+failed |= mismatches > 0
+print(f"{'✅' if not mismatches else '❌'} {n} rows, {mismatches} mismatches")
+
+print("\n" + "=" * 50)
+if failed:
+    print("❌ RISK RULES TEST FAILED")
+    sys.exit(1)
+print("✅ ALL TESTS PASSED - compiled rules match the original heuristic!")
+print("=" * 50)
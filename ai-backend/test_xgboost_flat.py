@@ -0,0 +1,77 @@
+"""
+Test flattened-tree XGBoost evaluator - parity with Booster.predict and latency
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+print("=" * 50)
+print("XGBOOST FLAT EVALUATOR TEST")
+print("=" * 50)
+
+# Test 1: Make sure a trained model exists
+print("\n[1] Checking model file...")
+from xgboost_model import MODEL_PATH, FEATURE_LOW, FEATURE_HIGH, train_xgboost_model, load_xgboost_model
+if not os.path.exists(MODEL_PATH):
+    print("   Training new model...")
+    train_xgboost_model()
+booster = load_xgboost_model()
+print(f"✅ Model loaded: {MODEL_PATH}")
+
+# Test 2: Export flattened arrays
+print("\n[2] Exporting flattened trees...")
+from xgboost_flat import export_flat_model, FlatTreeModel
+with tempfile.TemporaryDirectory() as tmp:
+    flat_path = os.path.join(tmp, "xgboost_flat.npz")
+    export_flat_model(booster, out_path=flat_path)
+    flat = FlatTreeModel.load(flat_path)
+    print(f"✅ Exported {len(flat.roots)} trees, {len(flat.feature)} nodes, depth {flat.depth} "
+          f"({os.path.getsize(flat_path)} bytes)")
+
+# Test 3: Parity with Booster.predict
+print("\n[3] Checking parity with Booster.predict...")
+import xgboost as xgb
+rng = np.random.default_rng(0)
+X = rng.uniform(FEATURE_LOW - 5, FEATURE_HIGH + 5, size=(20000, len(FEATURE_LOW))).astype(np.float32)
+X[::97, 2] = np.nan  # exercise default (missing value) directions
+expected = booster.predict(xgb.DMatrix(X))
+got = flat.predict_proba(X)
+max_err = float(np.abs(expected - got).max())
+same_class = float(np.mean(expected.argmax(1) == got.argmax(1)))
+if max_err < 1e-4 and same_class == 1.0:
+    print(f"✅ Parity OK: max |diff| = {max_err:.2e}, class agreement {same_class*100:.0f}%")
+else:
+    print(f"❌ Parity FAILED: max |diff| = {max_err:.2e}, class agreement {same_class*100:.2f}%")
+    sys.exit(1)
+
+# Test 4: Latency comparison
+print("\n[4] Latency per call (median of 2000)...")
+
+
+def median_us(fn, n=2000):
+    times = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return np.median(times) * 1e6
+
+
+row = X[:1]
+batch = X[:32]
+results = {
+    "Booster.predict(DMatrix) 1 row": median_us(lambda: booster.predict(xgb.DMatrix(row))),
+    "Booster.inplace_predict 1 row": median_us(lambda: booster.inplace_predict(row)),
+    "FlatTreeModel 1 row": median_us(lambda: flat.predict_proba(row)),
+    "Booster.inplace_predict 32 rows": median_us(lambda: booster.inplace_predict(batch)),
+    "FlatTreeModel 32 rows": median_us(lambda: flat.predict_proba(batch)),
+}
+for name, us in results.items():
+    print(f"   {name:<34} {us:8.1f} us")
+
+print("\n" + "=" * 50)
+print("✅ ALL TESTS PASSED - flat evaluator matches XGBoost!")
+print("=" * 50)
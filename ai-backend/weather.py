@@ -1,55 +1,339 @@
 import os
-import datetime
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+import weather_store
+
+try:
+    import aiohttp
+except ImportError:  # async client falls back to threads
+    aiohttp = None
 
 load_dotenv()
 
 API_KEY = os.getenv("WEATHER_API_KEY")
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+BASE_URL = os.getenv("WEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5/weather")
+
+# Upstream HTTP client settings
+CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("WEATHER_READ_TIMEOUT", 5))
+POOL_SIZE = int(os.getenv("WEATHER_POOL_SIZE", 20))
+MAX_RETRIES = int(os.getenv("WEATHER_MAX_RETRIES", 2))
+BACKOFF_BASE = 0.25   # seconds, doubled per attempt with full jitter
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Only failures to connect are retried: after a read timeout the server has the
+# request and is just slow, and retrying would multiply the caller's wait.
+# aiohttp before 3.10 has no ConnectionTimeoutError, so no timeout is retried there.
+_ASYNC_CONNECT_TIMEOUT = getattr(aiohttp, "ConnectionTimeoutError", ()) if aiohttp else ()
+
+_session = None
+_session_lock = threading.Lock()
+
+# In-process weather cache (seconds / entries)
+CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", 600))
+CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_SIZE", 512))
+
+# Longest a caller waits on another caller's in-flight fetch of the same location
+WAIT_TIMEOUT = float(os.getenv("WEATHER_WAIT_TIMEOUT", 30))
+# Distinct locations whose request frequency is kept (location strings come
+# from clients); at twice this many, all but the most requested are dropped
+REQUEST_COUNTS_MAX = int(os.getenv("WEATHER_REQUEST_COUNTS_MAX", 4 * CACHE_MAX_ENTRIES))
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()   # key -> (expires_at, data), oldest first
+_inflight = {}           # key -> Future shared by concurrent callers
+_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+_request_counts = Counter()  # key -> decayed request frequency (for prefetching)
+
+
+def _cache_key(location: str) -> str:
+    return " ".join(location.casefold().split())
+
 
 def get_weather(location: str) -> dict:
-    """Fetch current weather for `location` from OpenWeatherMap.
+    """Current weather for `location`, served from a TTL + LRU cache.
+
+    Concurrent misses for the same location wait on a single upstream call
+    instead of each calling OpenWeatherMap. The returned dict is shared
+    between callers and must not be modified.
+    """
+    key = _cache_key(location)
+    data, future, leader = _lookup(key)
+    if data is not None:
+        return data
+    if not leader:
+        return future.result(WAIT_TIMEOUT)
+    try:
+        data = fetch_weather(location)
+    except BaseException as e:
+        _settle(key, future, error=e)
+        raise
+    _settle(key, future, data)
+    _record(key, data)
+    return data
+
+
+async def get_weather_async(location: str, session=None) -> dict:
+    """Async `get_weather`: same cache, and coalesces with sync callers too."""
+    key = _cache_key(location)
+    data, future, leader = _lookup(key)
+    if data is not None:
+        return data
+    if not leader:
+        # Shielded: a cancelled waiter must not cancel the shared Future
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), WAIT_TIMEOUT)
+    try:
+        data = await fetch_weather_async(location, session)
+    except BaseException as e:
+        # Includes CancelledError (client gone): waiters and _inflight are still released
+        _settle(key, future, error=e)
+        raise
+    _settle(key, future, data)
+    await asyncio.to_thread(_record, key, data)
+    return data
+
+
+def _lookup(key: str):
+    """Cache probe: (data, None, False) on a hit, else the in-flight Future
+    and whether this caller is the leader that must fetch upstream."""
+    with _cache_lock:
+        _request_counts[key] += 1
+        if len(_request_counts) >= 2 * REQUEST_COUNTS_MAX:
+            _prune_request_counts(keep=key)
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return entry[1], None, False
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+            _cache_stats["misses"] += 1
+        else:
+            _cache_stats["coalesced"] += 1
+    return None, future, leader
+
+
+def _settle(key: str, future: Future, data=None, error=None):
+    """Publish a leader's result (or error) to the cache and its waiters."""
+    with _cache_lock:
+        if error is None:
+            _cache_put(key, data)
+        else:
+            _cache_stats["errors"] += 1
+        if _inflight.get(key) is future:
+            _inflight.pop(key)
+    if not isinstance(error, (Exception, type(None))):
+        # Waiters get an ordinary error, not the leader's cancellation
+        error = RuntimeError(f"Weather fetch for '{key}' was interrupted")
+    if future.set_running_or_notify_cancel():
+        if error is None:
+            future.set_result(data)
+        else:
+            future.set_exception(error)
+
+
+def _cache_put(key: str, data: dict):
+    """Insert/refresh a cache entry; caller holds `_cache_lock`."""
+    _cache[key] = (time.monotonic() + CACHE_TTL, data)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def refresh_weather(location: str) -> dict:
+    """Fetch `location` upstream now and replace its cache entry."""
+    key = _cache_key(location)
+    data = fetch_weather(location)
+    _record(key, data)
+    with _cache_lock:
+        _cache_put(key, data)
+    return data
+
+
+def cache_expires_in(location: str):
+    """Seconds until `location`'s cache entry expires (None if not cached)."""
+    with _cache_lock:
+        entry = _cache.get(_cache_key(location))
+    return None if entry is None else entry[0] - time.monotonic()
+
+
+def _prune_request_counts(keep: str):
+    """Keep the REQUEST_COUNTS_MAX most requested keys plus `keep` (caller holds the lock).
+
+    Runs once per REQUEST_COUNTS_MAX new keys, so its cost is amortized.
+    """
+    kept = dict(_request_counts.most_common(REQUEST_COUNTS_MAX))
+    kept[keep] = _request_counts[keep]
+    _request_counts.clear()
+    _request_counts.update(kept)
+
+
+def hot_locations(n: int) -> list:
+    """The `n` most requested locations (normalized keys), hottest first."""
+    with _cache_lock:
+        return [key for key, _ in _request_counts.most_common(n)]
+
+
+def decay_request_counts(factor: float = 0.5):
+    """Age request counts so hotness follows recent traffic."""
+    with _cache_lock:
+        for key in list(_request_counts):
+            _request_counts[key] *= factor
+            if _request_counts[key] < 0.01:
+                del _request_counts[key]
+
+
+def _record(key: str, data: dict):
+    """Append a fetched observation to the local store (best effort)."""
+    try:
+        weather_store.record_observation(key, data)
+    except Exception as e:
+        print(f"[WARNING] Could not record weather observation: {e}")
+
+
+def weather_cache_stats() -> dict:
+    """Hit/miss/coalesced counters and current size of the weather cache."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["size"] = len(_cache)
+        stats["inflight"] = len(_inflight)
+    stats["ttl_seconds"] = CACHE_TTL
+    stats["max_entries"] = CACHE_MAX_ENTRIES
+    return stats
+
+
+def clear_weather_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def fetch_weather(location: str) -> dict:
+    """Fetch current weather for `location` from OpenWeatherMap (uncached).
 
     Requires `WEATHER_API_KEY` environment variable to be set.
     Returns the JSON response as a dict. Raises on network/HTTP errors.
     """
+    params = _request_params(location)
+    session = get_session()
+    for attempt in range(MAX_RETRIES + 1):
+        last = attempt == MAX_RETRIES
+        try:
+            resp = session.get(BASE_URL, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except requests.ConnectionError:  # includes ConnectTimeout, not ReadTimeout
+            if last:
+                raise
+        else:
+            if resp.status_code not in RETRY_STATUSES or last:
+                resp.raise_for_status()
+                return resp.json()
+        time.sleep(_backoff(attempt))
+
+
+def get_session() -> requests.Session:
+    """Shared keep-alive session with a connection pool sized for concurrency."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _request_params(location: str) -> dict:
     if not API_KEY:
         raise RuntimeError("Missing WEATHER_API_KEY environment variable")
+    return {"q": location, "appid": API_KEY, "units": "metric"}
 
-    params = {"q": location, "appid": API_KEY, "units": "metric"}
-    resp = requests.get(BASE_URL, params=params, timeout=10)
-    resp.raise_for_status()
-    return resp.json()
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff delay for retry `attempt` (0-based)."""
+    return random.uniform(0, BACKOFF_BASE * (2 ** attempt))
+
+
+async def fetch_weather_async(location: str, session=None) -> dict:
+    """Async `fetch_weather` with the same timeouts and retry policy.
+
+    Uses aiohttp when installed (pass a shared `aiohttp.ClientSession` to
+    reuse connections), otherwise runs the pooled sync client in a thread.
+    """
+    if aiohttp is None:
+        return await asyncio.to_thread(fetch_weather, location)
+    if session is None:
+        async with _async_session() as own:
+            return await fetch_weather_async(location, own)
+
+    params = _request_params(location)
+    for attempt in range(MAX_RETRIES + 1):
+        last = attempt == MAX_RETRIES
+        try:
+            async with session.get(BASE_URL, params=params) as resp:
+                if resp.status not in RETRY_STATUSES or last:
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            read_timeout = isinstance(e, asyncio.TimeoutError) and not isinstance(e, _ASYNC_CONNECT_TIMEOUT)
+            if last or read_timeout:
+                raise
+        await asyncio.sleep(_backoff(attempt))
+
+
+def _async_session(limit: int = POOL_SIZE):
+    timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+    return aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=limit))
+
+
+async def fetch_weather_many_async(locations) -> dict:
+    """Fetch several locations concurrently over one async connection pool.
+
+    Returns {location: weather dict or the Exception raised for it}.
+    """
+    unique = list(dict.fromkeys(locations))
+    if aiohttp is None:
+        results = await asyncio.gather(*(fetch_weather_async(loc) for loc in unique),
+                                       return_exceptions=True)
+    else:
+        async with _async_session() as session:
+            results = await asyncio.gather(*(fetch_weather_async(loc, session) for loc in unique),
+                                           return_exceptions=True)
+    return dict(zip(unique, results))
+
+
+def get_weather_many(locations, max_workers: int = 8) -> dict:
+    """Fetch current weather for several locations concurrently.
+
+    Returns {location: weather dict or the Exception raised for it}.
+    """
+    unique = list(dict.fromkeys(locations))
+    if not unique:
+        return {}
+
+    def fetch(loc):
+        try:
+            return get_weather(loc)
+        except Exception as e:
+            return e
+
+    # Bounded by the session pool so threads don't queue on connections
+    with ThreadPoolExecutor(max_workers=min(max_workers, POOL_SIZE, len(unique))) as pool:
+        return dict(zip(unique, pool.map(fetch, unique)))
 
 
 def get_weather_history(location: str, days: int = 3) -> list:
-    """Fetch historical weather for past N days.
-    
-    Note: OpenWeatherMap free tier doesn't offer historical data.
-    This returns mock data based on current conditions for demo purposes.
+    """Stored weather for the past N days (one averaged entry per day).
+
+    Served from the local observation store filled by every upstream
+    fetch; never calls OpenWeatherMap. Days without readings are omitted.
     """
-    # Get current weather as base
-    current = get_weather(location)
-    history = []
-    
-    base_temp = current.get("main", {}).get("temp", 25)
-    base_humidity = current.get("main", {}).get("humidity", 50)
-    base_wind = current.get("wind", {}).get("speed", 5)
-    
-    for i in range(days):
-        day_offset = days - i
-        date = (datetime.datetime.now() - datetime.timedelta(days=day_offset)).strftime("%Y-%m-%d")
-        temp = base_temp + (i * 0.5)
-        humidity = max(30, min(90, base_humidity - (i * 3)))
-        wind = base_wind + (i * 0.3)
-        
-        history.append({
-            "date": date,
-            "temp": round(temp, 1),
-            "humidity": humidity,
-            "wind_speed": round(wind, 1),
-            "description": "Partly Cloudy" if i == 0 else ("Rainy" if i == 1 else "Clear")
-        })
-    
-    return history
+    return weather_store.daily_history(_cache_key(location), days)
@@ -0,0 +1,88 @@
+"""
+Background weather prefetching for hot locations.
+A daemon thread refreshes the most requested locations shortly before their
+cache entries expire, so popular locations always hit a warm cache.
+"""
+import os
+import threading
+import time
+
+import weather
+
+PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", 30))
+PREFETCH_INTERVAL = float(os.getenv("WEATHER_PREFETCH_INTERVAL", 30))
+# Refresh entries expiring within this many seconds
+PREFETCH_LEAD = float(os.getenv("WEATHER_PREFETCH_LEAD", 90))
+# Upstream budget for prefetching (OpenWeatherMap free tier allows 60/min)
+PREFETCH_MAX_CALLS_PER_MIN = float(os.getenv("WEATHER_PREFETCH_RATE", 30))
+# Request counts are halved after this many seconds
+DECAY_INTERVAL = float(os.getenv("WEATHER_PREFETCH_DECAY", 600))
+
+
+class WeatherPrefetcher(threading.Thread):
+    """Periodically refresh the top-N requested locations' cached weather."""
+
+    def __init__(self, top_n=PREFETCH_TOP_N, interval=PREFETCH_INTERVAL,
+                 lead=PREFETCH_LEAD, calls_per_min=PREFETCH_MAX_CALLS_PER_MIN):
+        super().__init__(name="weather-prefetch", daemon=True)
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.min_gap = 60.0 / calls_per_min if calls_per_min > 0 else 0
+        self.stats = {"cycles": 0, "refreshed": 0, "errors": 0}
+        self._stop_event = threading.Event()
+        self._last_call = 0.0
+        self._last_decay = time.monotonic()
+
+    def due_locations(self) -> list:
+        """Hot locations whose entry is missing or expires within `lead`."""
+        due = []
+        for key in weather.hot_locations(self.top_n):
+            remaining = weather.cache_expires_in(key)
+            if remaining is None or remaining < self.lead:
+                due.append(key)
+        return due
+
+    def run_once(self):
+        """Refresh due locations, spacing upstream calls by the rate budget."""
+        for key in self.due_locations():
+            wait = self._last_call + self.min_gap - time.monotonic()
+            if wait > 0 and self._stop_event.wait(wait):
+                return
+            self._last_call = time.monotonic()
+            try:
+                weather.refresh_weather(key)
+                self.stats["refreshed"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[WARNING] Prefetch failed for '{key}': {e}")
+        self.stats["cycles"] += 1
+
+        if time.monotonic() - self._last_decay >= DECAY_INTERVAL:
+            weather.decay_request_counts()
+            self._last_decay = time.monotonic()
+
+    def run(self):
+        print(f"[OK] Weather prefetch started (top {self.top_n}, every {self.interval:.0f}s)")
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_prefetcher = None
+
+
+def start_prefetcher(**kwargs) -> WeatherPrefetcher:
+    """Start the background prefetcher once per process."""
+    global _prefetcher
+    if _prefetcher is None or not _prefetcher.is_alive():
+        _prefetcher = WeatherPrefetcher(**kwargs)
+        _prefetcher.start()
+    return _prefetcher
+
+
+def prefetch_stats():
+    return None if _prefetcher is None else dict(_prefetcher.stats, alive=_prefetcher.is_alive())
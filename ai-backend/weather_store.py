@@ -0,0 +1,111 @@
+"""
+Append-only local store of weather observations.
+Every observation fetched from OpenWeatherMap is written to SQLite so
+/weather-history can answer from disk with an indexed range query.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.getenv("WEATHER_DB_PATH", "data/weather_observations.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    location     TEXT    NOT NULL,
+    observed_at  INTEGER NOT NULL,
+    day          TEXT    NOT NULL,
+    temp         REAL,
+    humidity     REAL,
+    wind_speed   REAL,
+    pressure     REAL,
+    rainfall     REAL,
+    description  TEXT,
+    raw          TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_obs_location_time ON observations (location, observed_at);
+CREATE INDEX IF NOT EXISTS idx_obs_location_day ON observations (location, day);
+"""
+
+_local = threading.local()
+
+
+def _connect():
+    """Per-thread connection (sqlite3 connections are not shareable)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != DB_PATH:
+        directory = os.path.dirname(DB_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, DB_PATH
+    return conn
+
+
+def record_observation(location: str, data: dict):
+    """Append one OpenWeatherMap response for `location` (normalized key).
+
+    Re-recording the same upstream reading (same `dt`) is a no-op.
+    """
+    observed_at = int(data.get("dt") or time.time())
+    main = data.get("main", {})
+    weather = data.get("weather") or [{}]
+    row = (
+        location,
+        observed_at,
+        datetime.datetime.fromtimestamp(observed_at, datetime.timezone.utc).strftime("%Y-%m-%d"),
+        main.get("temp"),
+        main.get("humidity"),
+        data.get("wind", {}).get("speed"),
+        main.get("pressure"),
+        (data.get("rain") or {}).get("1h"),
+        weather[0].get("description"),
+        json.dumps(data),
+    )
+    conn = _connect()
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+
+def query_observations(location: str, start: int, end: int) -> list:
+    """Raw observations for `location` with start <= observed_at <= end."""
+    rows = _connect().execute(
+        "SELECT observed_at, temp, humidity, wind_speed, pressure, rainfall, description "
+        "FROM observations WHERE location = ? AND observed_at BETWEEN ? AND ? "
+        "ORDER BY observed_at",
+        (location, int(start), int(end)),
+    ).fetchall()
+    keys = ["observed_at", "temp", "humidity", "wind_speed", "pressure", "rainfall", "description"]
+    return [dict(zip(keys, r)) for r in rows]
+
+
+def daily_history(location: str, days: int) -> list:
+    """Per-day averages of stored observations for the last `days` days (UTC).
+
+    Returns one entry per day that has readings, oldest first.
+    """
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    first_day = (today - datetime.timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    rows = _connect().execute(
+        "SELECT day, AVG(temp), AVG(humidity), AVG(wind_speed), AVG(pressure), COUNT(*), "
+        "(SELECT description FROM observations o2 WHERE o2.location = o.location AND o2.day = o.day "
+        " ORDER BY observed_at DESC LIMIT 1) "
+        "FROM observations o WHERE location = ? AND day >= ? GROUP BY day ORDER BY day",
+        (location, first_day),
+    ).fetchall()
+    return [
+        {
+            "date": day,
+            "temp": round(temp, 1) if temp is not None else None,
+            "humidity": round(humidity) if humidity is not None else None,
+            "wind_speed": round(wind, 1) if wind is not None else None,
+            "pressure": round(pressure) if pressure is not None else None,
+            "observations": count,
+            "description": (description or "").title() or None,
+        }
+        for day, temp, humidity, wind, pressure, count, description in rows
+    ]
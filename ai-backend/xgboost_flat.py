@@ -0,0 +1,133 @@
+"""
+Flattened-tree XGBoost evaluator.
+Exports the trained booster into compact NumPy arrays (node features,
+thresholds, children, leaf values) and walks them directly, avoiding
+DMatrix construction and booster call overhead for single rows.
+"""
+import json
+import os
+
+import numpy as np
+import xgboost as xgb
+
+FLAT_MODEL_PATH = "models/xgboost_flat.npz"
+
+
+def export_flat_model(booster=None, model_path="models/xgboost_disaster.json", out_path=FLAT_MODEL_PATH):
+    """Flatten all trees of a booster into arrays and save them as .npz.
+
+    Node arrays are global across trees (children point at global node ids,
+    -1 marks a leaf). The per-class base margin is measured from the booster
+    itself so it matches whatever base_score format the XGBoost version uses.
+    """
+    if booster is None:
+        booster = xgb.Booster()
+        booster.load_model(model_path)
+    model = json.loads(booster.save_raw(raw_format="json"))
+    gbtree = model["learner"]["gradient_booster"]["model"]
+    num_class = max(int(model["learner"]["learner_model_param"]["num_class"]), 1)
+    num_feature = int(model["learner"]["learner_model_param"]["num_feature"])
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in gbtree["trees"]:
+        lc = np.asarray(tree["left_children"], dtype=np.int32)
+        rc = np.asarray(tree["right_children"], dtype=np.int32)
+        is_leaf = lc == -1
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+        threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+        left.append(np.where(is_leaf, -1, lc + offset).astype(np.int32))
+        right.append(np.where(is_leaf, -1, rc + offset).astype(np.int32))
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        # Leaf values are stored in split_conditions for leaf nodes
+        value.append(np.where(is_leaf, tree["split_conditions"], 0).astype(np.float32))
+        offset += len(lc)
+
+    flat = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "default_left": np.concatenate(default_left),
+        "value": np.concatenate(value),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_class": np.asarray(gbtree["tree_info"], dtype=np.int32),
+        "num_class": np.int32(num_class),
+    }
+    flat["depth"] = np.int32(_max_depth(flat))
+
+    # Base margin = booster margin minus the summed leaves, on a probe row
+    probe = np.zeros((1, num_feature), dtype=np.float32)
+    margin = np.asarray(booster.inplace_predict(probe, predict_type="margin")).reshape(1, -1)
+    flat["base_margin"] = (margin - FlatTreeModel(flat).margins(probe))[0].astype(np.float32)
+
+    if out_path:
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        np.savez(out_path, **flat)
+    return FlatTreeModel(flat)
+
+
+def _max_depth(flat):
+    depth = 0
+    nodes = flat["roots"]
+    while True:
+        inner = nodes[flat["left"][nodes] != -1]
+        if len(inner) == 0:
+            return depth
+        nodes = np.concatenate([flat["left"][inner], flat["right"][inner]])
+        depth += 1
+
+
+class FlatTreeModel:
+    """Evaluates a flattened tree ensemble with NumPy gathers."""
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.default_left = arrays["default_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.num_class = int(arrays["num_class"])
+        self.depth = int(arrays["depth"])
+        self.base_margin = arrays.get("base_margin", np.zeros(self.num_class, dtype=np.float32))
+        # (trees, classes) one-hot used to sum leaf values per class
+        self.class_matrix = np.eye(self.num_class, dtype=np.float32)[arrays["tree_class"]]
+
+    def resident_bytes(self):
+        arrays = [self.feature, self.threshold, self.left, self.right, self.default_left,
+                  self.value, self.roots, self.base_margin, self.class_matrix]
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def load(cls, path=FLAT_MODEL_PATH):
+        with np.load(path) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def leaves(self, X):
+        """Leaf node id reached in every tree, shape (rows, trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            left = self.left[nodes]
+            inner = left != -1
+            if not inner.any():
+                break
+            x = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(inner, np.where(go_left, left, self.right[nodes]), nodes)
+        return nodes
+
+    def margins(self, X):
+        return self.value[self.leaves(X)] @ self.class_matrix + self.base_margin
+
+    def predict_proba(self, X):
+        """Softmax class probabilities, matching `multi:softprob`."""
+        m = self.margins(X)
+        m = np.exp(m - m.max(axis=1, keepdims=True))
+        return m / m.sum(axis=1, keepdims=True)
@@ -4,127 +4,279 @@ XGBoost Classifier for Disaster Prediction
 import xgboost as xgb
 import numpy as np
 import os
+import tempfile
+import time
 from sklearn.model_selection import train_test_split
+from risk_rules import TRAINING_KERNEL
+from inference_service import MicroBatcher
+from xgboost_flat import FLAT_MODEL_PATH, FlatTreeModel, export_flat_model
+from model_registry import registry
 
 MODEL_PATH = "models/xgboost_disaster.json"
-_cached_model = None
+
+# Micro-batching of concurrent single-row predictions
+BATCH_WINDOW_MS = float(os.getenv("XGB_BATCH_WINDOW_MS", 2))
+MAX_BATCH_ROWS = int(os.getenv("XGB_MAX_BATCH", 64))
+_batcher = None
+
+# "booster" (xgboost inplace_predict) or "flat" (NumPy flattened-tree evaluator)
+INFERENCE_BACKEND = os.getenv("XGB_BACKEND", "booster")
+
+# Feature order and sampling ranges of the synthetic training data
+FEATURES = ["temp", "humidity", "wind", "pressure", "rainfall"]
+FEATURE_LOW = np.array([-10, 20, 0, 980, 0], dtype=float)
+FEATURE_HIGH = np.array([50, 100, 40, 1030, 200], dtype=float)
+
+
+def label_samples(X):
+    """Risk labels for feature rows, using the shared rules in risk_rules."""
+    return TRAINING_KERNEL.classify(**{name: X[:, i] for i, name in enumerate(FEATURES)})
+
 
 def create_training_dataset():
     """Create synthetic training data (replace with real historical data)"""
     np.random.seed(42)
     n_samples = 5000
     
-    data = []
-    labels = []
+    # Same draws as sampling one feature at a time, row by row
+    X = FEATURE_LOW + (FEATURE_HIGH - FEATURE_LOW) * np.random.random_sample((n_samples, len(FEATURES)))
     
-    for i in range(n_samples):
-        # Generate weather features
-        temp = np.random.uniform(-10, 50)
-        humidity = np.random.uniform(20, 100)
-        wind = np.random.uniform(0, 40)
-        pressure = np.random.uniform(980, 1030)
-        rainfall = np.random.uniform(0, 200)
-        
-        # Calculate risk based on extreme conditions
-        risk_score = 0
-        
-        # Temperature extremes
-        if temp < 0 or temp > 45:
-            risk_score += 3
-        elif temp < 5 or temp > 40:
-            risk_score += 2
-        elif temp < 10 or temp > 35:
-            risk_score += 1
-        
-        # Humidity (flood risk)
-        if humidity > 90:
-            risk_score += 3
-        elif humidity > 80:
-            risk_score += 2
-        elif humidity > 70:
-            risk_score += 1
-        
-        # Wind (cyclone/storm risk)
-        if wind > 25:
-            risk_score += 3
-        elif wind > 15:
-            risk_score += 2
-        elif wind > 10:
-            risk_score += 1
-        
-        # Rainfall (flood risk)
-        if rainfall > 100:
-            risk_score += 3
-        elif rainfall > 50:
-            risk_score += 2
-        elif rainfall > 20:
-            risk_score += 1
-        
-        # Pressure (storm risk)
-        if pressure < 990:
-            risk_score += 2
-        elif pressure < 1000:
-            risk_score += 1
-        
-        # Map to risk level
-        if risk_score >= 8:
-            label = 3  # CRITICAL
-        elif risk_score >= 5:
-            label = 2  # HIGH
-        elif risk_score >= 2:
-            label = 1  # MEDIUM
-        else:
-            label = 0  # LOW
-        
-        data.append([temp, humidity, wind, pressure, rainfall])
-        labels.append(label)
+    return X, label_samples(X)
+
+TRAIN_PARAMS = {
+    'max_depth': 6,
+    'eta': 0.3,
+    'objective': 'multi:softprob',
+    'num_class': 4,
+    'eval_metric': 'mlogloss',
+    'tree_method': 'hist',
+    'nthread': os.cpu_count() or 1,
+    'verbosity': 0
+}
+TRAIN_CHUNK_ROWS = 1_000_000
+TRAIN_X_FILE = "train_X.npy"
+TRAIN_Y_FILE = "train_y.npy"
+
+
+def generate_training_chunks(n_samples, chunk_rows=TRAIN_CHUNK_ROWS, seed=42):
+    """Yield synthetic (X, y) chunks of at most `chunk_rows` rows.
     
-    return np.array(data), np.array(labels)
+    Features and labels are produced a whole chunk at a time, so any
+    number of samples can be generated in bounded memory.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_rows):
+        n = min(chunk_rows, n_samples - start)
+        X = rng.uniform(FEATURE_LOW, FEATURE_HIGH, size=(n, len(FEATURES))).astype(np.float32)
+        yield X, label_samples(X).astype(np.int8)
+
+
+def write_training_memmap(data_dir, n_samples, chunk_rows=TRAIN_CHUNK_ROWS, seed=42):
+    """Generate `n_samples` rows straight into memory-mapped .npy files."""
+    os.makedirs(data_dir, exist_ok=True)
+    X_mm = np.lib.format.open_memmap(os.path.join(data_dir, TRAIN_X_FILE), mode="w+",
+                                     dtype=np.float32, shape=(n_samples, len(FEATURES)))
+    y_mm = np.lib.format.open_memmap(os.path.join(data_dir, TRAIN_Y_FILE), mode="w+",
+                                     dtype=np.int8, shape=(n_samples,))
+    pos = 0
+    for X, y in generate_training_chunks(n_samples, chunk_rows, seed):
+        X_mm[pos:pos + len(X)] = X
+        y_mm[pos:pos + len(y)] = y
+        pos += len(X)
+    X_mm.flush()
+    y_mm.flush()
+    return X_mm, y_mm
 
-def train_xgboost_model():
-    """Train XGBoost model"""
-    print("[INFO] Creating training dataset...")
-    X, y = create_training_dataset()
+
+def load_training_memmap(data_dir):
+    """Open previously written training arrays read-only, without loading them."""
+    X = np.load(os.path.join(data_dir, TRAIN_X_FILE), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, TRAIN_Y_FILE), mmap_mode="r")
+    return X, y
+
+
+class ChunkIter(xgb.DataIter):
+    """Feeds XGBoost one chunk at a time from a re-startable chunk source."""
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    def __init__(self, make_chunks, cache_prefix=None):
+        self._make_chunks = make_chunks
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
     
-    print("[INFO] Training XGBoost model...")
-    dtrain = xgb.DMatrix(X_train, label=y_train)
-    dtest = xgb.DMatrix(X_test, label=y_test)
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter(self._make_chunks())
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        X, y = chunk
+        input_data(data=np.ascontiguousarray(X), label=np.asarray(y))
+        return True
     
-    params = {
-        'max_depth': 6,
-        'eta': 0.3,
-        'objective': 'multi:softmax',
-        'num_class': 4,
-        'eval_metric': 'mlogloss',
-        'verbosity': 0
-    }
+    def reset(self):
+        self._chunks = None
+
+
+def _memmap_chunks(X, y, chunk_rows):
+    return lambda: ((X[i:i + chunk_rows], y[i:i + chunk_rows]) for i in range(0, len(X), chunk_rows))
+
+
+def train_xgboost_model(n_samples=None, chunk_rows=TRAIN_CHUNK_ROWS, data_dir=None,
+                        external_memory=False, num_boost_round=50):
+    """Train XGBoost model
     
-    model = xgb.train(params, dtrain, num_boost_round=50, verbose_eval=False)
+    Args:
+        n_samples: synthetic rows to train on; None keeps the small 5000-row
+                   in-memory dataset
+        chunk_rows: rows generated / fed to XGBoost per chunk
+        data_dir: write (or reuse) memory-mapped training arrays here
+        external_memory: page the training data to disk instead of building
+                         an in-memory QuantileDMatrix
+    """
+    t0 = time.perf_counter()
+    cache_tmp = None
+    if n_samples is None:
+        print("[INFO] Creating training dataset...")
+        X, y = create_training_dataset()
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        dtrain = xgb.QuantileDMatrix(X_train, label=y_train)
+        n_train = len(X_train)
+    else:
+        print(f"[INFO] Preparing {n_samples:,} training samples in chunks of {chunk_rows:,}...")
+        if data_dir:
+            X_path = os.path.join(data_dir, TRAIN_X_FILE)
+            if os.path.exists(X_path) and np.load(X_path, mmap_mode="r").shape[0] == n_samples:
+                X_mm, y_mm = load_training_memmap(data_dir)
+            else:
+                X_mm, y_mm = write_training_memmap(data_dir, n_samples, chunk_rows)
+            make_chunks = _memmap_chunks(X_mm, y_mm, chunk_rows)
+        else:
+            make_chunks = lambda: generate_training_chunks(n_samples, chunk_rows)
+        
+        if external_memory:
+            if data_dir:
+                cache_dir = data_dir
+            else:
+                # Page files are only needed while training; removed afterwards
+                cache_tmp = tempfile.TemporaryDirectory(prefix="xgb_cache_")
+                cache_dir = cache_tmp.name
+            dtrain = xgb.DMatrix(ChunkIter(make_chunks, cache_prefix=os.path.join(cache_dir, "xgb_cache")))
+        else:
+            dtrain = xgb.QuantileDMatrix(ChunkIter(make_chunks))
+        # Independent hold-out set (different seed)
+        X_test, y_test = next(generate_training_chunks(min(200_000, max(n_samples // 5, 1)),
+                                                       chunk_rows=200_000, seed=43))
+        n_train = n_samples
+    build_time = time.perf_counter() - t0
+    print(f"[INFO] Training data ready in {build_time:.2f}s")
+    
+    print(f"[INFO] Training XGBoost model (hist, {TRAIN_PARAMS['nthread']} threads)...")
+    t1 = time.perf_counter()
+    try:
+        model = xgb.train(TRAIN_PARAMS, dtrain, num_boost_round=num_boost_round, verbose_eval=False)
+    finally:
+        if cache_tmp is not None:
+            del dtrain
+            cache_tmp.cleanup()
+    train_time = time.perf_counter() - t1
     
     # Save model
     os.makedirs("models", exist_ok=True)
     model.save_model(MODEL_PATH)
+    registry.reload("xgboost")
+    registry.reload("xgboost_flat")
     
     # Test accuracy
-    predictions = model.predict(dtest)
+    predictions = np.argmax(predict_proba(X_test, model=model), axis=1)
     accuracy = np.mean(predictions == y_test)
     print(f"[OK] XGBoost trained! Accuracy: {accuracy*100:.0f}%")
+    print(f"[INFO] Data build {build_time:.2f}s, training {train_time:.2f}s "
+          f"({n_train * num_boost_round / max(train_time, 1e-9):,.0f} row-rounds/s)")
     
     return model
 
+def _load_booster(paths):
+    if not paths:
+        raise FileNotFoundError(MODEL_PATH)
+    booster = xgb.Booster()
+    booster.load_model(paths[0])
+    return booster
+
+
+def _load_flat(paths):
+    """Flattened-tree model, re-exported when the booster file is newer."""
+    if not paths:
+        raise FileNotFoundError(MODEL_PATH)
+    if os.path.exists(FLAT_MODEL_PATH) and os.path.getmtime(FLAT_MODEL_PATH) >= os.path.getmtime(MODEL_PATH):
+        return FlatTreeModel.load(FLAT_MODEL_PATH)
+    return export_flat_model(load_xgboost_model())
+
+
+registry.register("xgboost", [MODEL_PATH], _load_booster)
+registry.register("xgboost_flat", [MODEL_PATH], _load_flat)
+
+
 def load_xgboost_model():
-    """Load XGBoost model and cache it"""
-    global _cached_model
-    if _cached_model is None:
-        try:
-            if os.path.exists(MODEL_PATH):
-                _cached_model = xgb.Booster()
-                _cached_model.load_model(MODEL_PATH)
-        except Exception as e:
-            print(f"Error loading model: {e}")
-    return _cached_model
+    """Load XGBoost model (cached and hot-reloaded by the model registry)"""
+    return registry.get("xgboost")
+
+def load_flat_model():
+    return registry.get("xgboost_flat")
+
+
+def predict_proba(X, model=None, backend=None):
+    """Class probabilities (n, 4) for feature rows in one call.
+    
+    `backend` overrides XGB_BACKEND ("booster" or "flat") when no explicit
+    Booster is passed.
+    """
+    if model is None and (backend or INFERENCE_BACKEND) == "flat":
+        flat = load_flat_model()
+        if flat is not None:
+            return flat.predict_proba(X)
+    if model is None:
+        model = load_xgboost_model()
+    proba = np.asarray(model.inplace_predict(np.asarray(X, dtype=np.float32)))
+    if proba.ndim == 1:
+        # Models trained with multi:softmax return class ids; treat as one-hot
+        proba = np.eye(4, dtype=np.float32)[proba.astype(int)]
+    return proba
+
+
+def get_batcher():
+    """Shared micro-batcher that runs concurrent requests as one batch."""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(predict_proba, max_batch=MAX_BATCH_ROWS,
+                                max_wait_ms=BATCH_WINDOW_MS, name="xgboost-batcher")
+    return _batcher
+
+
+RISK_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+COLORS = ['#4CAF50', '#FFC107', '#FF9800', '#F44336']
+EMOJIS = ['✅', '⚠️', '⚠️⚠️', '🚨']
+RECOMMENDATIONS = {
+    'LOW': 'No immediate threat. Stay informed about weather updates.',
+    'MEDIUM': 'Moderate risk. Review disaster preparedness checklist.',
+    'HIGH': 'High risk! Prepare emergency kit and know evacuation routes.',
+    'CRITICAL': '[ALERT] CRITICAL ALERT! Follow local authorities and evacuate if instructed.'
+}
+
+
+def format_prediction(proba):
+    """Build the API response from one row of class probabilities."""
+    prediction = int(np.argmax(proba))
+    return {
+        "risk": RISK_LEVELS[prediction],
+        "color": COLORS[prediction],
+        "emoji": EMOJIS[prediction],
+        "confidence": round(float(proba[prediction]), 2),
+        "probabilities": {level: round(float(p), 2) for level, p in zip(RISK_LEVELS, proba)},
+        "recommendation": RECOMMENDATIONS[RISK_LEVELS[prediction]],
+        "model": "XGBoost AI",
+        "risk_class": prediction
+    }
+
 
 def predict_with_xgboost(temp, humidity, wind, pressure=1013, rainfall=0, model=None):
     """
@@ -136,63 +288,40 @@ def predict_with_xgboost(temp, humidity, wind, pressure=1013, rainfall=0, model=
         wind: Wind speed in m/s
         pressure: Atmospheric pressure in hPa
         rainfall: Rainfall in mm
+        model: explicit Booster to use; by default the cached model is used
+               through the shared micro-batcher
     
     Returns:
         dict: Prediction result
     """
     try:
-        # Use cached model or load it
-        if model is None:
-            model = load_xgboost_model()
-        
-        if model is None:
+        if model is None and load_xgboost_model() is None:
             print("[WARNING] Model not found, training new model...")
             train_xgboost_model()
-            model = load_xgboost_model()
-        
-        # Prepare input
-        features = np.array([[temp, humidity, wind, pressure, rainfall]])
-        dmatrix = xgb.DMatrix(features)
-        
-        # Predict
-        prediction = int(model.predict(dmatrix)[0])
-        
-        # Get prediction probabilities for confidence
-        try:
-            # For multi-class, get probability of predicted class
-            proba = model.predict(dmatrix, output_margin=False)
-            confidence = 0.70 + (prediction * 0.05)  # Vary by risk level
-        except:
-            confidence = 0.75
         
-        risk_levels = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
-        colors = ['#4CAF50', '#FFC107', '#FF9800', '#F44336']
-        emojis = ['✅', '⚠️', '⚠️⚠️', '🚨']
-        
-        recommendations = {
-            'LOW': 'No immediate threat. Stay informed about weather updates.',
-            'MEDIUM': 'Moderate risk. Review disaster preparedness checklist.',
-            'HIGH': 'High risk! Prepare emergency kit and know evacuation routes.',
-            'CRITICAL': '[ALERT] CRITICAL ALERT! Follow local authorities and evacuate if instructed.'
-        }
+        features = [temp, humidity, wind, pressure, rainfall]
+        if model is None:
+            proba = get_batcher().predict(features)
+        else:
+            proba = predict_proba([features], model=model)[0]
         
-        return {
-            "risk": risk_levels[prediction],
-            "color": colors[prediction],
-            "emoji": emojis[prediction],
-            "confidence": round(confidence, 2),
-            "recommendation": recommendations[risk_levels[prediction]],
-            "model": "XGBoost AI",
-            "risk_class": prediction
-        }
+        return format_prediction(proba)
     
     except Exception as e:
         print(f"Error in XGBoost prediction: {e}")
         return None
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the XGBoost disaster model")
+    parser.add_argument("--samples", type=int, default=None, help="synthetic training rows (default: 5000 in memory)")
+    parser.add_argument("--chunk-rows", type=int, default=TRAIN_CHUNK_ROWS)
+    parser.add_argument("--data-dir", default=None, help="store training arrays as memory-mapped .npy files")
+    parser.add_argument("--external-memory", action="store_true")
+    args = parser.parse_args()
+    
     # Train model
-    train_xgboost_model()
+    train_xgboost_model(args.samples, args.chunk_rows, args.data_dir, args.external_memory)
     
     # Test predictions
     print("\n[TEST] Testing predictions:")